@@ -1,20 +1,29 @@
-import os
+import copy
+import queue
 import random
-from pathlib import Path
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
 
 import cv2
 import numpy as np
 from tqdm import tqdm
 
 import utils.colormaps as cm
-from gol import GoL
-from imageRenderer import RenderSettings, renderImage
-from utils import boardIO
+from gol import GoL, RegionSnapshot
+from imageRenderer import RenderSettings, renderImage, viewportMapping
+from utils import boardIO, videoWriters
+
+# Number of rendered frames that are kept to be reused when a board repeats, e.g. oscillators and still lifes
+FRAME_CACHE_SIZE = 16
 
 
 class GoLVideoRenderer:
     def __init__(self, filename, videoWidth, videoHeight, fps=30, fpg=1, showNeighbourCount=False, showGridlines=False,
-                 colormap=None, renderer=None):
+                 colormap=None, renderer=None, renderWorkers=0, queueSize=64, frameWorkers=0, videoWriter=None,
+                 frameCacheSize=FRAME_CACHE_SIZE):
         self.filename = filename
         self.videoWidth = int(videoWidth)
         self.videoHeight = int(videoHeight)
@@ -31,12 +40,34 @@ class GoLVideoRenderer:
         # Videosettings
         self.fps = fps
         self.fpg = fpg
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        os.makedirs(Path(filename).parent, exist_ok=True)
-        self.vidOut = cv2.VideoWriter(self.filename, fourcc, self.fps, (self.videoWidth, self.videoHeight), isColor=1)
+        # Called with (filename, fps, frameSize), e.g. videoWriters.PipeVideoWriter. Defaults to cv2 with XVID
+        videoWriter = videoWriter if videoWriter is not None else videoWriters.cv2VideoWriter
+        self.vidOut = videoWriter(self.filename, self.fps, (self.videoWidth, self.videoHeight))
         self.frameNo = 0
         self.oldImage = None
 
+        # Pipeline settings. With renderWorkers > 0 simulation, rendering and encoding run concurrently
+        self.renderWorkers = renderWorkers
+        self.queueSize = queueSize
+
+        # With frameWorkers > 0 and fpg > 1 the frames of one generation are rendered by a process pool
+        self.frameWorkers = frameWorkers
+        self._framePool = None
+        self._sharedBoard = None
+
+        # Frames by (board hash, viewport, colors, extras), least recently used first. 0 disables the cache
+        self.frameCacheSize = frameCacheSize
+        self._frameCache = OrderedDict()
+        self.reusedFrames = 0
+
+    @property
+    def statefulRenderer(self):
+        """
+        Renderers with state between frames (stateful = True, e.g. IncrementalRenderer) have to see the frames in
+        order. They are rendered by a single render thread and never by the frame pool.
+        """
+        return getattr(self.renderer, "stateful", False)
+
     def appendGoL(self, gol: GoL, maxGenerations=100,
                   tl=(0, 0), br=(-1, -1), preview=False, abortCondition=None, onColorChange=0, offColorChange=0,
                   **kwargs):
@@ -53,17 +84,14 @@ class GoLVideoRenderer:
         except TypeError:
             minBR = maxBR = br
 
+        viewport = (maxGenerations, minTL, maxTL, minBR, maxBR)
+        if self.renderWorkers > 0:
+            self._appendGoLPipelined(gol, viewport, preview, abortCondition, onColorChange, offColorChange)
+            return
+
         progressRange = tqdm(range(maxGenerations + 1))
         for i in progressRange:
-            for frameNo in range(self.fpg):
-                curTL = [min_tl + (max_tl - min_tl) / (maxGenerations * self.fpg) * ((i - 1) * self.fpg + frameNo) for
-                         min_tl, max_tl in zip(minTL, maxTL)]
-                curBR = [min_br + (max_br - min_br) / (maxGenerations * self.fpg) * ((i - 1) * self.fpg + frameNo) for
-                         min_br, max_br in zip(minBR, maxBR)]
-                self.renderSettings.topLeft = curTL
-                self.renderSettings.bottomRight = curBR
-
-                img = self.renderer(gol, self.renderSettings)
+            for img in self._renderGeneration(gol, i, viewport):
                 if preview:
                     cv2.imshow(self.filename, img)
                     cv2.setWindowTitle(self.filename, f"{self.filename} - Frame {self.frameNo}")
@@ -80,16 +108,226 @@ class GoLVideoRenderer:
                 progressRange.close()
                 return
 
-            changeOnColor = (0.5 - random.random()) * 2 * onColorChange
-            changeOffColor = (0.5 - random.random()) * 2 * offColorChange
-            self.renderSettings.onColorIndex = min(max(self.renderSettings.onColorIndex + changeOnColor, 128), 255)
-            self.renderSettings.offColorIndex = min(max(self.renderSettings.offColorIndex + changeOffColor, 0), 128)
+            self._changeColors(onColorChange, offColorChange)
+
+    def _renderGeneration(self, gol: GoL, i, viewport):
+        """Frames of the current generation. Rendered in parallel by the frame pool if enabled."""
+        if self.frameWorkers <= 0 or self.fpg <= 1 or self.statefulRenderer:
+            for frameNo in range(self.fpg):
+                self._setViewport(i, frameNo, *viewport)
+                yield self._cachedFrame(gol, self.renderSettings, lambda: self.renderer(gol, self.renderSettings))
+            return
+
+        frameSettings = self._generationSettings(i, viewport)
+        region = self._frameRegion(gol, frameSettings)
+        boardInfo = None
+        futures = []
+        for settings in frameSettings:
+            def submit():
+                nonlocal boardInfo
+                if boardInfo is None:
+                    boardInfo = self._shareBoard(gol, region)
+                return self._framePool.submit(_renderSharedBoard, self.renderer, boardInfo, gol.name, settings)
+
+            futures.append(self._cachedFrame(gol, settings, submit))
+        for future in futures:
+            yield future.result()
+
+    def _frameKey(self, gol: GoL, settings):
+        """Everything the rendered frame depends on, None if the frame must not be reused."""
+        if self.frameCacheSize <= 0 or callable(settings.colormap):
+            return None
+        key = [gol.boardHash(), tuple(settings.topLeft), tuple(settings.bottomRight), settings.onColorIndex,
+               settings.offColorIndex, settings.showNeighbours, settings.showGridlines, repr(settings.highlights),
+               repr(settings.texts)]
+        if settings.colormap is not None:
+            key.append(np.asarray(settings.colormap).tobytes())
+        if hasattr(gol.getEngine(), "getRegion"):
+            # Unbounded engines can show cells outside of the board
+            mapping = viewportMapping(tuple(settings.topLeft), tuple(settings.bottomRight), settings.width,
+                                      settings.height, gol.width, gol.height)
+            key.append(boardIO.hashBoard(gol.getRegion(*mapping.regionBounds())))
+        return tuple(key)
+
+    def _cachedFrame(self, gol: GoL, settings, render):
+        """Returns a cached frame (image or future of a render job) for the same key, else the result of render()."""
+        key = self._frameKey(gol, settings)
+        if key is None:
+            return render()
+        frame = self._frameCache.get(key)
+        if frame is not None:
+            self._frameCache.move_to_end(key)
+            self.reusedFrames += 1
+            return frame
+        frame = self._frameCache[key] = render()
+        if len(self._frameCache) > self.frameCacheSize:
+            self._frameCache.popitem(last=False)
+        return frame
+
+    def _frameRegion(self, gol: GoL, frameSettings):
+        """
+        (xMin, yMin, xMax, yMax) of all cells shown by the frames, None unless the engine of gol simulates an
+        unbounded universe. Only these cells are copied for the render workers, with a margin of one cell for the
+        neighbour counts.
+        """
+        if not hasattr(gol.getEngine(), "getRegion"):
+            return None
+        xMins, yMins, xMaxs, yMaxs = zip(*[viewportMapping(tuple(settings.topLeft), tuple(settings.bottomRight),
+                                                           settings.width, settings.height, gol.width,
+                                                           gol.height).regionBounds() for settings in frameSettings])
+        return int(min(xMins)) - 1, int(min(yMins)) - 1, int(max(xMaxs)) + 1, int(max(yMaxs)) + 1
+
+    def _shareBoard(self, gol: GoL, region=None):
+        """
+        Copies the board of gol into shared memory that is read by the frame workers, followed by the cells of region
+        for engines with an unbounded universe.
+        """
+        arrays = [np.asarray(gol.board)]
+        if region is not None:
+            arrays.append(np.asarray(gol.getRegion(*region)))
+        size = sum(array.nbytes for array in arrays)
+        if self._sharedBoard is None or self._sharedBoard.size < size:
+            self._closeFrameWorkers()
+            self._sharedBoard = shared_memory.SharedMemory(create=True, size=max(1, size))
+            self._framePool = ProcessPoolExecutor(max_workers=self.frameWorkers)
+        shm = self._sharedBoard
+        offset = 0
+        for array in arrays:
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=offset)[...] = array
+            offset += array.nbytes
+        return shm.name, [(array.shape, array.dtype.str) for array in arrays], region
+
+    def _closeFrameWorkers(self):
+        if self._framePool is not None:
+            self._framePool.shutdown()
+            self._framePool = None
+        if self._sharedBoard is not None:
+            self._sharedBoard.close()
+            self._sharedBoard.unlink()
+            self._sharedBoard = None
+
+    def _setViewport(self, i, frameNo, maxGenerations, minTL, maxTL, minBR, maxBR):
+        curTL = [min_tl + (max_tl - min_tl) / (maxGenerations * self.fpg) * ((i - 1) * self.fpg + frameNo) for
+                 min_tl, max_tl in zip(minTL, maxTL)]
+        curBR = [min_br + (max_br - min_br) / (maxGenerations * self.fpg) * ((i - 1) * self.fpg + frameNo) for
+                 min_br, max_br in zip(minBR, maxBR)]
+        self.renderSettings.topLeft = curTL
+        self.renderSettings.bottomRight = curBR
+
+    def _changeColors(self, onColorChange, offColorChange):
+        changeOnColor = (0.5 - random.random()) * 2 * onColorChange
+        changeOffColor = (0.5 - random.random()) * 2 * offColorChange
+        self.renderSettings.onColorIndex = min(max(self.renderSettings.onColorIndex + changeOnColor, 128), 255)
+        self.renderSettings.offColorIndex = min(max(self.renderSettings.offColorIndex + changeOffColor, 0), 128)
+
+    def _generationSettings(self, i, viewport):
+        """_frameSettings of all frames of generation i."""
+        frameSettings = []
+        for frameNo in range(self.fpg):
+            self._setViewport(i, frameNo, *viewport)
+            frameSettings.append(self._frameSettings())
+        return frameSettings
+
+    def _frameSettings(self):
+        """Copy of the current render settings that stays valid while the next frames are prepared."""
+        settings = copy.copy(self.renderSettings)
+        if callable(settings.colormap):
+            settings.colormap = settings.colormap()  # Stateful colormaps have to be evaluated in frame order
+        return settings
+
+    def _appendGoLPipelined(self, gol: GoL, viewport, preview, abortCondition, onColorChange, offColorChange):
+        """
+        Simulation producer thread -> pool of render workers -> ordered encoder in the calling thread. Render jobs are
+        passed as futures through a bounded queue, so the encoder writes frames in order and the producer blocks
+        when it is too far ahead.
+        """
+        maxGenerations = viewport[0]
+        frames = queue.Queue(maxsize=self.queueSize)
+        stop = threading.Event()
+        errors = []
+        stageTimes = {"simulation": 0, "rendering": 0, "encoding": 0}
+        stageLock = threading.Lock()
+        nGenerations = 0
+
+        def render(snapshot, settings):
+            t1 = time.time()
+            img = self.renderer(snapshot, settings)
+            with stageLock:
+                stageTimes["rendering"] += time.time() - t1
+            return img
+
+        def simulate():
+            nonlocal nGenerations
+            try:
+                progressRange = tqdm(range(maxGenerations + 1))
+                for i in progressRange:
+                    frameSettings = self._generationSettings(i, viewport)
+                    snapshot = gol.snapshot(self._frameRegion(gol, frameSettings))
+                    for settings in frameSettings:
+                        if stop.is_set():
+                            return
+                        frame = self._cachedFrame(snapshot, settings, lambda: pool.submit(render, snapshot, settings))
+                        frames.put(frame)
+
+                    t1 = time.time()
+                    gol.step()
+                    stageTimes["simulation"] += time.time() - t1
+                    nGenerations += 1
+
+                    if abortCondition is not None and abortCondition(gol):
+                        progressRange.close()
+                        return
+
+                    self._changeColors(onColorChange, offColorChange)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                frames.put(None)
+
+        t0 = time.time()
+        nFrames = 0
+        with ThreadPoolExecutor(max_workers=1 if self.statefulRenderer else self.renderWorkers) as pool:
+            producer = threading.Thread(target=simulate, daemon=True)
+            producer.start()
+            while True:
+                future = frames.get()
+                if future is None:
+                    break
+                img = future.result()
+                if stop.is_set():
+                    continue  # Drain the queue so the producer can finish
+
+                if preview:
+                    cv2.imshow(self.filename, img)
+                    cv2.setWindowTitle(self.filename, f"{self.filename} - Frame {self.frameNo}")
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        self.finish()
+                        stop.set()
+                        continue
+
+                t1 = time.time()
+                self.vidOut.write(img)
+                stageTimes["encoding"] += time.time() - t1
+                self.frameNo += 1
+                nFrames += 1
+            producer.join()
+        if errors:
+            raise errors[0]
+
+        wallTime = time.time() - t0
+        print(f"[{self.filename}] {nGenerations} generations, {nFrames} frames in {wallTime:.2f}s "
+              f"({nFrames / max(wallTime, 1e-9):.1f} frames/s, {self.reusedFrames} reused)")
+        for stage, count, unit in [("simulation", nGenerations, "generations"), ("rendering", nFrames, "frames"),
+                                   ("encoding", nFrames, "frames")]:
+            busy = stageTimes[stage]
+            print(f"  {stage:>10}: busy {busy:.2f}s, {count / max(busy, 1e-9):.1f} {unit}/s")
 
     def __del__(self):
         self.finish()
 
     def finish(self):
         self.vidOut.release()
+        self._closeFrameWorkers()
 
     def addHighlight(self, position, color):
         if isinstance(color, str):
@@ -102,23 +340,91 @@ class GoLVideoRenderer:
         self.renderSettings.texts.append((position, text, color))
 
     def renderImage(self, gol: GoL):
-        if not isinstance(gol, GoL):
+        if not isinstance(gol, GoL) and not hasattr(gol, "getRegion"):  # e.g. boardIO.MappedBoard
             gol = GoL(gol)
         return self.renderer(gol, self.renderSettings)
 
 
+# Shared boards attached by the current frame worker process
+_attachedBoards = {}
+
+
+def _renderSharedBoard(renderer, boardInfo, name, settings):
+    shmName, arrays, region = boardInfo
+    if shmName not in _attachedBoards:
+        _attachedBoards[shmName] = shared_memory.SharedMemory(name=shmName)
+    views = []
+    offset = 0
+    for shape, dtype in arrays:
+        views.append(np.ndarray(shape, dtype=dtype, buffer=_attachedBoards[shmName].buf, offset=offset))
+        views[-1].flags.writeable = False
+        offset += views[-1].nbytes
+    gol = GoL(views[0])
+    gol.name = name
+    if region is not None:
+        gol.engine = RegionSnapshot(views[1], *region[:2])
+    return renderer(gol, settings)
+
+
+# Longest period that CycleDetector recognizes by default
+CYCLE_MAX_PERIOD = 128
+
+
+class CycleDetector:
+    """
+    Abort condition that stops as soon as the board repeats. The hashes of the last maxPeriod generations are kept,
+    so every cycle with period <= maxPeriod is found at its first repetition. Then period is the exact period and
+    transient the number of generations before the cycle was entered. With extendGenerations > 0 the simulation
+    continues for that many generations after the detection.
+    """
+
+    def __init__(self, initBoard=None, maxPeriod=CYCLE_MAX_PERIOD, extendGenerations=0):
+        self.maxPeriod = maxPeriod
+        self.extendGenerations = extendGenerations
+        self.period = None
+        self.transient = None
+        self.detectedAt = None
+
+        self._generations = {}  # Hash -> generation
+        self._hashes = deque()
+        if initBoard is not None:
+            self._add(boardIO.hashBoard(initBoard), 0)
+
+    def _add(self, boardHash, generation):
+        self._generations[boardHash] = generation
+        self._hashes.append(boardHash)
+        if len(self._hashes) > self.maxPeriod:
+            del self._generations[self._hashes.popleft()]
+
+    def __call__(self, gol: GoL, **kwargs):
+        if self.period is None:
+            boardHash = gol.boardHash()
+            previous = self._generations.get(boardHash)
+            if previous is None:
+                self._add(boardHash, gol.generation)
+                return False
+            self.period = gol.generation - previous
+            self.transient = previous
+            self.detectedAt = gol.generation
+        return gol.generation >= self.detectedAt + self.extendGenerations
+
+
 class AbortDifHandler:
     def __init__(self, initBoard, extendGenerations=1):
-        self.oldBoard = initBoard
-        self.oldDif = np.zeros_like(initBoard)
+        self.oldBoard = np.asarray(initBoard, dtype=np.int8)  # Signed, boards are bool
+        self.oldDif = np.zeros_like(self.oldBoard)
         self.nGen = 0
         self.extendGenerations = extendGenerations
 
     def __call__(self, gol: GoL, **kwargs):
+        changeMask = getattr(gol.engine, "changeMask", None)
+        if changeMask is not None and not changeMask.any():
+            return True  # Board is static
+
         dif = np.abs(np.subtract(self.oldBoard, gol.board))
         dif2 = np.abs(np.subtract(dif, self.oldDif))
         self.oldDif = dif
-        self.oldBoard = gol.board.astype(int)
+        self.oldBoard = gol.board.astype(np.int8)
 
         difSum = np.sum(dif)
         difSum2 = np.sum(dif2)
@@ -150,8 +456,8 @@ if __name__ == '__main__':
         print(f"On Cells: ~{rndThresh * 100:.2f}%")
         board = boardIO.createRandomBoard(192 * k, 108 * k, rndThreshold=rndThresh)
         gol = GoL(board)
-        abort = AbortDifHandler(board, extendGenerations=150)
-        vid.appendGoL(gol, 1000, abortCondition=AbortDifHandler(board), onColorChange=0, offColorChange=0)
+        abort = CycleDetector(board, extendGenerations=150)
+        vid.appendGoL(gol, 1000, abortCondition=abort, onColorChange=0, offColorChange=0)
         try:
             vid.colormap.invert()
         except AttributeError:
@@ -0,0 +1,81 @@
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from gol import GoL
+from utils import boardIO
+
+
+def measure(name, func):
+    """Runs func and prints its time and the peak of the memory allocated meanwhile (NumPy arrays included)."""
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    t1 = time.time()
+    result = func()
+    t2 = time.time()
+    current, peak = tracemalloc.get_traced_memory()
+    print(f"{name:>20}: {t2 - t1:6.2f}s, peak +{(peak - before) / 2 ** 20:8.1f} MiB, "
+          f"kept +{(current - before) / 2 ** 20:8.1f} MiB")
+    return result
+
+
+def baselineRandomBoard(width, height, rndThreshold=0.5):
+    """createRandomBoard before the bool boards: float64 board and a float64 random number per cell at once."""
+    board = np.zeros((width, height))
+    rnd = np.random.random((width, height))
+    board[np.where(rnd < rndThreshold)] = 1
+    return board
+
+
+class BaselineGoL(GoL):
+    """
+    GoL before the bool boards, with the attributes and the step of the baseline copied: keeps the float64 board and
+    an int64 oldBoard, the step pads an int64 copy of the board and sums int64 neighbour counts.
+    """
+
+    def __init__(self, initBoard):
+        self.width, self.height = len(initBoard), len(initBoard[0])
+        self.name = f"{self.width}x{self.height}"
+        self.generation = 0
+        self.engineFactory = None
+        self.history = None
+
+        self.oldBoard = np.full((self.width, self.height), 0)
+        self.board = np.asarray(initBoard)
+        self._initialBoard = self.board
+
+    def _singlestep(self):
+        G = self.board.astype(int)
+        N = np.zeros_like(G)
+        G = np.pad(G, pad_width=1, mode='constant', constant_values=0)
+        N[:, :] = (G[:-2, :-2] + G[:-2, 1:-1] + G[:-2, 2:] +
+                   G[1:-1, :-2] + G[1:-1, 2:] +
+                   G[2:, :-2] + G[2:, 1:-1] + G[2:, 2:])
+
+        self.board = np.logical_or(N == 3, np.logical_and(G[1:-1, 1:-1] == 1, N == 2))
+
+        self.generation += 1
+
+
+if __name__ == '__main__':
+    # Usage, from this folder: PYTHONPATH=.. python boardMemory.py [size] [--baseline]
+    # Default 20000x20000 (needs ~2.5 GiB). --baseline measures the float64/int64 boards from before the bool boards
+    # (needs ~40 bytes per cell, so e.g. 5000x5000 for the comparison).
+    args = [arg for arg in sys.argv[1:] if arg != "--baseline"]
+    baseline = "--baseline" in sys.argv[1:]
+    size = int(args[0]) if args else 20000
+    print(f"Board: {size}x{size}{' (baseline)' if baseline else ''}")
+
+    tracemalloc.start()
+    createBoard = baselineRandomBoard if baseline else boardIO.createRandomBoard
+    board = measure("createRandomBoard", lambda: createBoard(size, size))
+    print(f"{'board dtype':>20}: {board.dtype}, {board.nbytes / size / size:.0f} bytes per cell")
+    gol = measure("GoL()", lambda: BaselineGoL(board) if baseline else GoL(board))
+    measure("step() (first)", gol.step)
+    measure("step()", gol.step)
+    if not baseline:  # The baseline had no neighbourCounts
+        measure("neighbourCounts()", gol.neighbourCounts)
+    print(f"{'total':>20}: {tracemalloc.get_traced_memory()[0] / 2 ** 20:8.1f} MiB, "
+          f"peak {tracemalloc.get_traced_memory()[1] / 2 ** 20:8.1f} MiB")
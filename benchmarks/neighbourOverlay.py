@@ -0,0 +1,36 @@
+import time
+
+import utils.colormaps as cm
+from gol import GoL
+from imageRenderer import RenderSettings, renderImage, renderImageCellwise
+from utils import boardIO
+
+
+def secondsPerFrame(render, gol, settings, frames):
+    render(gol, settings)  # Warm up, e.g. the viewport mapping and the glyph atlas
+    t1 = time.time()
+    for _ in range(frames):
+        render(gol, settings)
+    t2 = time.time()
+    return (t2 - t1) / frames
+
+
+if __name__ == '__main__':
+    # Usage, from this folder: PYTHONPATH=.. python neighbourOverlay.py
+    # The first case are the settings of videoGeneration/training.py
+    cases = [((512, 512), (10, 10)), ((1080, 1080), (10, 10)), ((1920, 1080), (96, 54)), ((1920, 1080), (192, 108))]
+    frames = 20
+    for (width, height), (boardWidth, boardHeight) in cases:
+        # renderImageCellwise reads the cells around the viewport, so they have to exist
+        gol = GoL(boardIO.addBorder(boardIO.createRandomBoard(boardWidth, boardHeight), 1))
+        settings = RenderSettings(width, height)
+        settings.topLeft = (1, 1)
+        settings.bottomRight = (-2, -2)
+        settings.colormap = cm.COLORMAP_WHITE_GREEN
+        settings.showGridlines = True
+        settings.showNeighbours = True
+
+        cellwise = secondsPerFrame(renderImageCellwise, gol, settings, frames)
+        vectorized = secondsPerFrame(renderImage, gol, settings, frames)
+        print(f"{width}x{height}, board {boardWidth}x{boardHeight}: renderImageCellwise {cellwise * 1000:7.2f} ms, "
+              f"renderImage {vectorized * 1000:7.2f} ms (x{cellwise / vectorized:.2f})")
@@ -0,0 +1,33 @@
+import os
+import time
+
+from engines.parallel import ParallelEngine
+from gol import GoL
+from utils import boardIO
+
+
+def generationsPerSecond(gol, generations):
+    gol.step()  # Warm up, e.g. start the worker pool
+    t1 = time.time()
+    gol.step(generations)
+    t2 = time.time()
+    return generations / (t2 - t1)
+
+
+if __name__ == '__main__':
+    # Usage, from this folder: PYTHONPATH=.. python parallelStep.py
+    size = (4000, 4000)
+    generations = 20
+    board = boardIO.createRandomBoard(*size)
+    print(f"Board: {size[0]}x{size[1]}, {generations} generations")
+
+    baseline = generationsPerSecond(GoL(board), generations)
+    print(f"GoL._singlestep:          {baseline:8.2f} gen/s")
+
+    workers = 1
+    while workers <= os.cpu_count():
+        gol = GoL(board, engine=lambda b: ParallelEngine(b, workers=workers))
+        speed = generationsPerSecond(gol, generations)
+        print(f"ParallelEngine {workers:2d} workers: {speed:8.2f} gen/s (x{speed / baseline:.2f})")
+        gol.engine.close()
+        workers *= 2
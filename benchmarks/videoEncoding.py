@@ -0,0 +1,37 @@
+import shutil
+import time
+from functools import partial
+
+import utils.colormaps as cm
+from VideoRenderer import GoLVideoRenderer
+from gol import GoL
+from utils import boardIO
+from utils.videoWriters import NullVideoWriter, PipeVideoWriter, cv2VideoWriter
+
+
+def framesPerSecond(videoWriter, board, generations):
+    vid = GoLVideoRenderer("../data/videos/benchmark.avi", 1920, 1080, fps=24, colormap=cm.COLORMAP_WHITE_GREEN,
+                           videoWriter=videoWriter)
+    t1 = time.time()
+    vid.appendGoL(GoL(board), generations)
+    vid.finish()
+    t2 = time.time()
+    return (generations + 1) / (t2 - t1)
+
+
+if __name__ == '__main__':
+    # Usage, from this folder: PYTHONPATH=.. python videoEncoding.py. Writes ../data/videos/benchmark.avi
+    board = boardIO.createRandomBoard(384, 216)
+    generations = 200
+
+    writers = [("Null (rendering only)", NullVideoWriter), ("cv2 XVID", cv2VideoWriter)]
+    if shutil.which("ffmpeg") is not None:
+        writers += [("ffmpeg pipe x264", PipeVideoWriter),
+                    ("ffmpeg pipe lossless", partial(PipeVideoWriter, lossless=True))]
+
+    rendering = None
+    for name, videoWriter in writers:
+        speed = framesPerSecond(videoWriter, board, generations)
+        rendering = rendering or speed
+        encodingCost = max(0, 1 / speed - 1 / rendering) * 1000
+        print(f"{name:>22}: {speed:7.2f} frames/s, encoding ~{encodingCost:.2f} ms/frame")
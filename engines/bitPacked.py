@@ -0,0 +1,81 @@
+import numpy as np
+
+WORD_BITS = 64
+
+
+def pack(board):
+    board = np.asarray(board).astype(bool)
+    width, height = board.shape
+    nWords = max(1, -(-height // WORD_BITS))
+    packedBytes = np.packbits(board, axis=1, bitorder="little")
+    words = np.zeros((width, nWords * 8), dtype="B")
+    words[:, :packedBytes.shape[1]] = packedBytes
+    return words.view("<u8")
+
+
+def unpack(words, height):
+    return np.unpackbits(words.view("B"), axis=1, count=height, bitorder="little").astype(bool)
+
+
+class BitPackedEngine:
+    """
+    Stores every x-row of the board as uint64 words (64 cells per word, cell y in bit y % 64 of word y // 64)
+    and computes the next generation with bitwise full adders instead of per-cell integer sums.
+    """
+
+    def __init__(self, board):
+        board = np.asarray(board)
+        self.width, self.height = board.shape
+        self.words = pack(board)
+
+        # Padding bits behind the last cell of a row have to stay dead
+        self.lastWordMask = np.uint64((1 << (self.height % WORD_BITS or WORD_BITS)) - 1)
+
+    def toBoard(self):
+        return unpack(self.words, self.height)
+
+    def getXY(self, x, y):
+        return bool((int(self.words[x, y // WORD_BITS]) >> (y % WORD_BITS)) & 1)
+
+    def step(self, n=1):
+        for _ in range(n):
+            self._singlestep()
+
+    def _singlestep(self):
+        P = self.words
+        one = np.uint64(1)
+        carryShift = np.uint64(WORD_BITS - 1)
+
+        # Neighbours at y - 1 and y + 1, carrying bits across word boundaries
+        left = P << one
+        left[:, 1:] |= P[:, :-1] >> carryShift
+        right = P >> one
+        right[:, :-1] |= P[:, 1:] << carryShift
+
+        # Row sums as two bit planes: including the center cell for rows above/below, excluding it for the own row
+        sumOnes = left ^ right
+        sumTwos = left & right
+        rowOnes = sumOnes ^ P
+        rowTwos = sumTwos | (sumOnes & P)
+        del left, right
+
+        upOnes = np.zeros_like(P)
+        upTwos = np.zeros_like(P)
+        upOnes[1:] = rowOnes[:-1]
+        upTwos[1:] = rowTwos[:-1]
+        downOnes = np.zeros_like(P)
+        downTwos = np.zeros_like(P)
+        downOnes[:-1] = rowOnes[1:]
+        downTwos[:-1] = rowTwos[1:]
+        del rowOnes, rowTwos
+
+        # Full adder over the three ones-planes, then a 4-input parity/carry over the twos-planes
+        ones = upOnes ^ sumOnes ^ downOnes
+        carry = (upOnes & sumOnes) | (downOnes & (upOnes ^ sumOnes))
+        twos = upTwos ^ sumTwos ^ downTwos ^ carry
+        fours = (upTwos & sumTwos) ^ (downTwos & carry) ^ ((upTwos ^ sumTwos) & (downTwos ^ carry))
+
+        # Alive next generation: exactly 3 neighbours, or 2 neighbours and alive
+        P = twos & ~fours & (ones | P)
+        P[:, -1] &= self.lastWordMask
+        self.words = P
@@ -0,0 +1,101 @@
+import numpy as np
+
+from utils import boardIO
+
+# Dead cells that are added behind the living cells on every side they reached when the board is reallocated
+GROW_CHUNK = 64
+
+
+class ExpandingEngine:
+    """
+    Dense engine on an unbounded universe. The cells live in a bordered array that covers the bounding box of all
+    living cells plus a margin, (originX, originY) are the world coordinates of its first cell. When living cells
+    come close to an edge, the array is reallocated around the current bounding box: growChunk cells are added on
+    the sides that were reached, the other sides keep their margin up to growChunk cells. So the array grows in
+    bounded chunks only where the pattern grows, and moves along with patterns that travel, e.g. gliders, instead
+    of growing behind them.
+
+    toBoard returns the initial width x height window, getRegion reads any part of the universe in world
+    coordinates, so renderer viewports (tl/br) keep working on the moving universe.
+    """
+
+    def __init__(self, board, growChunk=GROW_CHUNK):
+        board = np.asarray(board)
+        self.width, self.height = board.shape
+        self.growChunk = growChunk
+
+        self._current = np.zeros((self.width + 2, self.height + 2), dtype=bool)
+        self._current[1:-1, 1:-1] = board
+        self._next = np.zeros_like(self._current)
+        self._neighbours = np.empty((self.width, self.height), dtype=np.uint8)
+        self.originX, self.originY = -1, -1
+        self.reallocations = 0
+
+    @property
+    def shape(self):
+        return self._current.shape
+
+    def boundingBox(self):
+        """(xMin, yMin, xMax, yMax) of all living cells with exclusive maxima, None if there are none."""
+        xs = np.flatnonzero(self._current.any(axis=1))
+        if not len(xs):
+            return None
+        ys = np.flatnonzero(self._current.any(axis=0))
+        return (int(xs[0]) + self.originX, int(ys[0]) + self.originY,
+                int(xs[-1]) + 1 + self.originX, int(ys[-1]) + 1 + self.originY)
+
+    def _margin(self, space):
+        """New margin of a side with space dead cells between the living cells and the edge of the array."""
+        return self.growChunk if space <= 1 else min(space, self.growChunk)
+
+    def _reallocate(self, box):
+        xMin, yMin, xMax, yMax = box
+        width, height = self._current.shape
+        left, right = self._margin(xMin - self.originX), self._margin(self.originX + width - xMax)
+        top, bottom = self._margin(yMin - self.originY), self._margin(self.originY + height - yMax)
+
+        cells = np.zeros((left + xMax - xMin + right, top + yMax - yMin + bottom), dtype=bool)
+        cells[left:left + xMax - xMin, top:top + yMax - yMin] = self.getRegion(*box)
+        self._current = cells
+        self._next = np.zeros_like(cells)
+        self._neighbours = np.empty((cells.shape[0] - 2, cells.shape[1] - 2), dtype=np.uint8)
+        self.originX, self.originY = xMin - left, yMin - top
+        self.reallocations += 1
+
+    def _nearEdge(self):
+        # The outermost cells are never computed and stay dead. Cells next to them could give birth to them.
+        C = self._current
+        return C[1].any() or C[-2].any() or C[:, 1].any() or C[:, -2].any()
+
+    def step(self, n=1):
+        for _ in range(n):
+            if self._nearEdge():
+                self._reallocate(self.boundingBox())
+            self._singlestep()
+
+    def _singlestep(self):
+        N = boardIO.neighbourSum(self._current.view(np.uint8), self._neighbours)
+        np.bitwise_or(N, self._current[1:-1, 1:-1].view(np.uint8), out=N)
+        np.equal(N, 3, out=self._next[1:-1, 1:-1])
+        self._current, self._next = self._next, self._current
+
+    def getXY(self, x, y):
+        x, y = x - self.originX, y - self.originY
+        width, height = self._current.shape
+        return bool(self._current[x, y]) if 0 <= x < width and 0 <= y < height else False
+
+    def setXY(self, x, y, value):
+        width, height = self._current.shape
+        if value and not (1 <= x - self.originX < width - 1 and 1 <= y - self.originY < height - 1):
+            box = self.boundingBox() or (x, y, x + 1, y + 1)
+            self._reallocate((min(box[0], x), min(box[1], y), max(box[2], x + 1), max(box[3], y + 1)))
+        x, y = x - self.originX, y - self.originY
+        if 0 <= x < self._current.shape[0] and 0 <= y < self._current.shape[1]:
+            self._current[x, y] = value
+
+    def getRegion(self, xMin, yMin, xMax, yMax):
+        """Cells with xMin <= x < xMax and yMin <= y < yMax in world coordinates."""
+        return boardIO.boardRegion(self._current, xMin, yMin, xMax, yMax, self.originX, self.originY)
+
+    def toBoard(self):
+        return self.getRegion(0, 0, self.width, self.height)
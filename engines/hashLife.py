@@ -0,0 +1,253 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+# Number of memoized nodes/successors per engine after which all memoized nodes are dropped together. Evicting single
+# entries would create duplicates of canonical nodes that only compare equal by deep comparison.
+NODE_CACHE_SIZE = 2 ** 20
+
+# Nodes up to this level are converted to numpy blocks as a whole when extracting regions
+_BLOCK_LEVEL = 4
+
+
+class Node(namedtuple("Node", ["k", "a", "b", "c", "d", "n", "hash"])):
+    """
+    Quadtree node of size 2^k x 2^k. a, b, c, d are the top left, top right, bottom left and bottom right children,
+    where top/left means smaller y/x. n is the number of living cells.
+    """
+    __slots__ = ()
+
+    def __hash__(self):
+        return self.hash
+
+
+ON = Node(0, None, None, None, None, 1, 1)
+OFF = Node(0, None, None, None, None, 0, 0)
+
+
+class HashLifeEngine:
+    """
+    Quadtree/HashLife engine. Nodes are canonicalized and their successors memoized, so periodic and sparse patterns
+    can be advanced by 2^k generations in one call. The universe is unbounded: cells that leave the initial
+    width x height window keep on living and may come back, which differs from the dead edges of the dense step.
+    """
+
+    def __init__(self, board, cacheSize=NODE_CACHE_SIZE):
+        board = np.asarray(board)
+        self.width, self.height = board.shape
+
+        self.cacheSize = cacheSize
+        self.cacheClears = 0
+        self.join = lru_cache(maxsize=None)(self._join)
+        self.successor = lru_cache(maxsize=None)(self._successor)
+        self.zero = lru_cache(maxsize=None)(self._zero)
+        self._blockToArray = lru_cache(maxsize=None)(self._toArray)
+
+        k = max(3, int(np.ceil(np.log2(max(self.width, self.height, 1)))))
+        self.root = self._fromArray(board.astype(bool), k)
+        self.originX, self.originY = 0, 0  # World coordinates of the top left cell of root
+
+    # === Node construction ===
+    def _join(self, a, b, c, d):
+        n = a.n + b.n + c.n + d.n
+        return Node(a.k + 1, a, b, c, d, n, hash((a.k + 1, a.hash, b.hash, c.hash, d.hash)))
+
+    def _zero(self, k):
+        if k == 0:
+            return OFF
+        z = self.zero(k - 1)
+        return self.join(z, z, z, z)
+
+    def _fromArray(self, board, k):
+        size = 2 ** k
+        if not board.any():
+            return self.zero(k)
+        if k == 0:
+            return ON
+        if board.shape != (size, size):
+            padded = np.zeros((size, size), dtype=bool)
+            padded[:board.shape[0], :board.shape[1]] = board
+            board = padded
+        half = size // 2
+        return self.join(self._fromArray(board[:half, :half], k - 1),
+                         self._fromArray(board[half:, :half], k - 1),
+                         self._fromArray(board[:half, half:], k - 1),
+                         self._fromArray(board[half:, half:], k - 1))
+
+    def centre(self, m):
+        z = self.zero(m.k - 1)
+        return self.join(self.join(z, z, z, m.a), self.join(z, z, m.b, z),
+                         self.join(z, m.c, z, z), self.join(m.d, z, z, z))
+
+    # === Simulation ===
+    def _life4x4(self, m):
+        cells = np.zeros((4, 4), dtype=int)
+        for quadrant, (qx, qy) in zip((m.a, m.b, m.c, m.d), ((0, 0), (2, 0), (0, 2), (2, 2))):
+            for leaf, (lx, ly) in zip((quadrant.a, quadrant.b, quadrant.c, quadrant.d),
+                                      ((0, 0), (1, 0), (0, 1), (1, 1))):
+                cells[qx + lx, qy + ly] = leaf.n
+
+        def nextCell(x, y):
+            neighbours = cells[x - 1:x + 2, y - 1:y + 2].sum() - cells[x, y]
+            return ON if neighbours == 3 or (neighbours == 2 and cells[x, y]) else OFF
+
+        return self.join(nextCell(1, 1), nextCell(2, 1), nextCell(1, 2), nextCell(2, 2))
+
+    def _successor(self, m, j):
+        """Centre of m (level k - 1) advanced by 2^j generations, 0 <= j <= k - 2."""
+        if m.n == 0:
+            return m.a
+        if m.k == 2:
+            return self._life4x4(m)
+
+        j = min(j, m.k - 2)
+        join, successor = self.join, self.successor
+        a, b, c, d = m.a, m.b, m.c, m.d
+        c1 = successor(a, j)
+        c2 = successor(join(a.b, b.a, a.d, b.c), j)
+        c3 = successor(b, j)
+        c4 = successor(join(a.c, a.d, c.a, c.b), j)
+        c5 = successor(join(a.d, b.c, c.b, d.a), j)
+        c6 = successor(join(b.c, b.d, d.a, d.b), j)
+        c7 = successor(c, j)
+        c8 = successor(join(c.b, d.a, c.d, d.c), j)
+        c9 = successor(d, j)
+
+        if j < m.k - 2:
+            return join(join(c1.d, c2.c, c4.b, c5.a),
+                        join(c2.d, c3.c, c5.b, c6.a),
+                        join(c4.d, c5.c, c7.b, c8.a),
+                        join(c5.d, c6.c, c8.b, c9.a))
+        return join(successor(join(c1, c2, c4, c5), j),
+                    successor(join(c2, c3, c5, c6), j),
+                    successor(join(c4, c5, c7, c8), j),
+                    successor(join(c5, c6, c8, c9), j))
+
+    def step(self, n=1):
+        j = 0
+        while n:
+            if n & 1:
+                self._jump(j)
+            n >>= 1
+            j += 1
+
+    def _limitCache(self):
+        """Clears all memoized nodes once there are more than cacheSize. Only between jumps, so roots stay valid."""
+        if self.join.cache_info().currsize + self.successor.cache_info().currsize <= self.cacheSize:
+            return
+        for cache in (self.join, self.successor, self.zero, self._blockToArray):
+            cache.cache_clear()
+        self.cacheClears += 1
+
+    def _jump(self, j):
+        """Advances the universe by 2^j generations."""
+        self._limitCache()
+        self._crop()
+        while self.root.k < j + 1:
+            self._pad()
+        self._pad()
+        self._pad()
+        quarter = 2 ** (self.root.k - 2)
+        self.root = self.successor(self.root, j)
+        self.originX += quarter
+        self.originY += quarter
+
+    def _pad(self):
+        half = 2 ** (self.root.k - 1)
+        self.root = self.centre(self.root)
+        self.originX -= half
+        self.originY -= half
+
+    def _crop(self):
+        m = self.root
+        while m.k > 3:
+            inner = self.join(m.a.d, m.b.c, m.c.b, m.d.a)
+            if inner.n != m.n:
+                break
+            quarter = 2 ** (m.k - 2)
+            self.originX += quarter
+            self.originY += quarter
+            m = inner
+        self.root = m
+
+    # === Editing ===
+    def setXY(self, x, y, value):
+        """Sets a cell in world coordinates. The path to its leaf is rebuilt, the root is padded if necessary."""
+        while not (0 <= x - self.originX < 2 ** self.root.k and 0 <= y - self.originY < 2 ** self.root.k):
+            self._pad()
+        self.root = self._set(self.root, x - self.originX, y - self.originY, bool(value))
+
+    def _set(self, m, x, y, value):
+        if m.k == 0:
+            return ON if value else OFF
+        half = 2 ** (m.k - 1)
+        right, bottom = x >= half, y >= half
+        x, y = x - half * right, y - half * bottom
+        a, b, c, d = m.a, m.b, m.c, m.d
+        if bottom:
+            if right:
+                d = self._set(d, x, y, value)
+            else:
+                c = self._set(c, x, y, value)
+        elif right:
+            b = self._set(b, x, y, value)
+        else:
+            a = self._set(a, x, y, value)
+        return self.join(a, b, c, d)
+
+    # === Extraction ===
+    def getXY(self, x, y):
+        x -= self.originX
+        y -= self.originY
+        m = self.root
+        size = 2 ** m.k
+        if not (0 <= x < size and 0 <= y < size):
+            return False
+        while m.k > 0 and m.n:
+            size //= 2
+            right, bottom = x >= size, y >= size
+            m = (m.d if right else m.c) if bottom else (m.b if right else m.a)
+            x -= size * right
+            y -= size * bottom
+        return bool(m.n)
+
+    def getRegion(self, xMin, yMin, xMax, yMax):
+        """Cells with xMin <= x < xMax and yMin <= y < yMax in world coordinates."""
+        region = np.zeros((max(0, xMax - xMin), max(0, yMax - yMin)), dtype=bool)
+        self._fill(self.root, self.originX - xMin, self.originY - yMin, region)
+        return region
+
+    def toBoard(self):
+        return self.getRegion(0, 0, self.width, self.height)
+
+    def _toArray(self, m):
+        size = 2 ** m.k
+        if m.n == 0:
+            return np.zeros((size, size), dtype=bool)
+        if m.k == 0:
+            return np.ones((1, 1), dtype=bool)
+        half = size // 2
+        block = np.empty((size, size), dtype=bool)
+        block[:half, :half] = self._blockToArray(m.a)
+        block[half:, :half] = self._blockToArray(m.b)
+        block[:half, half:] = self._blockToArray(m.c)
+        block[half:, half:] = self._blockToArray(m.d)
+        return block
+
+    def _fill(self, m, x, y, region):
+        size = 2 ** m.k
+        w, h = region.shape
+        if m.n == 0 or x >= w or y >= h or x + size <= 0 or y + size <= 0:
+            return
+        if m.k <= _BLOCK_LEVEL:
+            block = self._blockToArray(m)
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + size, w), min(y + size, h)
+            region[x0:x1, y0:y1] = block[x0 - x:x1 - x, y0 - y:y1 - y]
+            return
+        half = size // 2
+        self._fill(m.a, x, y, region)
+        self._fill(m.b, x + half, y, region)
+        self._fill(m.c, x, y + half, region)
+        self._fill(m.d, x + half, y + half, region)
@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class ParallelEngine:
+    """
+    Splits the board into horizontal stripes (ranges of x) that are computed by a persistent thread pool. NumPy
+    releases the GIL inside its loops, so the stripes are computed in parallel. All workers read from and write to
+    the same two bordered boards, neighbouring rows of other stripes are read in place as halo. Every worker owns
+    its scratch buffers, so no memory is allocated or copied between generations.
+    """
+
+    def __init__(self, board, workers=None):
+        board = np.asarray(board)
+        self.width, self.height = board.shape
+        self.workers = workers if workers is not None else os.cpu_count()
+
+        # Two boards with a dead border of one cell. Only the inner cells are ever written
+        self._current = np.zeros((self.width + 2, self.height + 2), dtype=bool)
+        self._current[1:-1, 1:-1] = board
+        self._next = np.zeros_like(self._current)
+
+        bounds = np.linspace(0, self.width, min(self.workers, self.width) + 1).astype(int)
+        self.stripes = [(x0, x1) for x0, x1 in zip(bounds[:-1], bounds[1:]) if x0 < x1]
+        self._scratch = [(np.empty((x1 - x0, self.height), dtype=np.uint8),
+                          np.empty((x1 - x0, self.height), dtype=bool))
+                         for x0, x1 in self.stripes]
+        self.pool = ThreadPoolExecutor(max_workers=len(self.stripes))
+
+    def toBoard(self):
+        return self._current[1:-1, 1:-1].copy()
+
+    def getXY(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError
+        return self._current[x + 1, y + 1]
+
+    def step(self, n=1):
+        for _ in range(n):
+            list(self.pool.map(self._stepStripe, range(len(self.stripes))))
+            self._current, self._next = self._next, self._current
+
+    def _stepStripe(self, i):
+        x0, x1 = self.stripes[i]
+        N, tmp = self._scratch[i]
+        S = self._current[x0:x1 + 2].view(np.uint8)  # Stripe including one halo row above and below
+        out = self._next[x0 + 1:x1 + 1, 1:-1]
+
+        np.add(S[:-2, :-2], S[:-2, 1:-1], out=N)
+        for neighbour in (S[:-2, 2:], S[1:-1, :-2], S[1:-1, 2:], S[2:, :-2], S[2:, 1:-1], S[2:, 2:]):
+            np.add(N, neighbour, out=N)
+
+        np.equal(N, 3, out=out)
+        np.equal(N, 2, out=tmp)
+        np.logical_and(tmp, S[1:-1, 1:-1], out=tmp)
+        np.logical_or(out, tmp, out=out)
+
+    def close(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+    def __del__(self):
+        # The garbage collector can run this in any thread, even in one that is starting a thread for another pool.
+        # Joining the workers there deadlocks, they stop on their own after the shutdown.
+        self.close(wait=False)
@@ -0,0 +1,91 @@
+import numpy as np
+
+# Cells are stored as int64 keys (x + KEY_BIAS) * KEY_STRIDE + (y + KEY_BIAS), so sorting the keys sorts by x, then y
+KEY_STRIDE = 2 ** 31
+KEY_BIAS = 2 ** 30
+
+_NEIGHBOUR_OFFSETS = np.array([dx * KEY_STRIDE + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy],
+                              dtype=np.int64)
+
+
+def toKeys(xs, ys):
+    return (np.asarray(xs, dtype=np.int64) + KEY_BIAS) * KEY_STRIDE + (np.asarray(ys, dtype=np.int64) + KEY_BIAS)
+
+
+def fromKeys(keys):
+    return keys // KEY_STRIDE - KEY_BIAS, keys % KEY_STRIDE - KEY_BIAS
+
+
+class SparseEngine:
+    """
+    Stores only the living cells as a sorted array of coordinate keys. Neighbour counts are obtained by shifting all
+    keys to their 8 neighbours and counting duplicates, so the costs depend on the number of living cells, not on
+    the board size. The universe is unbounded (|x|, |y| < 2^30): cells outside of the initial width x height window
+    keep on living, which differs from the dead edges of the dense step. toBoard returns the initial window,
+    getRegion reads any part of the universe.
+    """
+
+    def __init__(self, board):
+        board = np.asarray(board)
+        self.width, self.height = board.shape
+        self.keys = toKeys(*np.nonzero(board))
+
+    @classmethod
+    def fromCoordinates(cls, xs, ys, width, height):
+        """E.g. from boardIO.loadRLECoordinates, without creating a dense board first."""
+        engine = cls(np.zeros((0, 0), dtype=bool))
+        engine.width, engine.height = width, height
+        engine.keys = np.unique(toKeys(xs, ys))
+        return engine
+
+    @property
+    def livingCells(self):
+        return len(self.keys)
+
+    def boundingBox(self):
+        """(xMin, yMin, xMax, yMax) of all living cells with exclusive maxima, None if there are none."""
+        if not len(self.keys):
+            return None
+        xs, ys = fromKeys(self.keys)
+        return int(xs[0]), int(ys.min()), int(xs[-1]) + 1, int(ys.max()) + 1
+
+    def step(self, n=1):
+        for _ in range(n):
+            self._singlestep()
+
+    def _singlestep(self):
+        if not len(self.keys):
+            return
+        neighbours = (self.keys[None, :] + _NEIGHBOUR_OFFSETS[:, None]).ravel()
+        candidates, counts = np.unique(neighbours, return_counts=True)
+        alive = counts == 3
+        twos = np.flatnonzero(counts == 2)
+        alive[twos] = self._contains(candidates[twos])
+        self.keys = candidates[alive]
+
+    def _contains(self, keys):
+        indices = np.searchsorted(self.keys, keys)
+        return self.keys[np.minimum(indices, len(self.keys) - 1)] == keys
+
+    def getXY(self, x, y):
+        return bool(self._contains(toKeys([x], [y]))[0]) if len(self.keys) else False
+
+    def setXY(self, x, y, value):
+        key = toKeys([x], [y])
+        if value:
+            self.keys = np.union1d(self.keys, key)
+        else:
+            self.keys = np.setdiff1d(self.keys, key, assume_unique=True)
+
+    def getRegion(self, xMin, yMin, xMax, yMax):
+        """Cells with xMin <= x < xMax and yMin <= y < yMax."""
+        region = np.zeros((max(0, xMax - xMin), max(0, yMax - yMin)), dtype=bool)
+        # Keys are sorted by x, so the x-range is a contiguous slice
+        start, end = np.searchsorted(self.keys, toKeys([xMin, xMax], [-KEY_BIAS, -KEY_BIAS]))
+        xs, ys = fromKeys(self.keys[start:end])
+        inside = (ys >= yMin) & (ys < yMax)
+        region[xs[inside] - xMin, ys[inside] - yMin] = True
+        return region
+
+    def toBoard(self):
+        return self.getRegion(0, 0, self.width, self.height)
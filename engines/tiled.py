@@ -0,0 +1,116 @@
+import numpy as np
+
+from utils.boardIO import neighbourSum
+
+TILE_SIZE = 32
+# Above this share of active tiles the whole board is computed in one pass, which is cheaper than many small runs
+FULL_STEP_RATIO = 0.5
+# Full passes skip the change tracking, it is only redone every this many generations to notice the board settling
+FULL_STEP_CHECK = 16
+
+
+class TiledEngine:
+    """
+    Splits the board into tileSize x tileSize tiles and only recomputes tiles that changed in the last generation
+    or have a changed neighbour tile. All other tiles are stable and keep their state.
+
+    changeMask[i, j] is True if a cell in tile (i, j) changed in the last generation. It is exposed so renderers and
+    abort conditions can skip unchanged areas. While most tiles are active the plain step runs without tracking
+    changes and changeMask is all True, only every FULL_STEP_CHECK generations the changes are tracked again.
+
+    Only worth it for boards where most tiles are stable, e.g. large settled boards with a few active spots. Ash
+    full of blinkers keeps most tiles active, then the plain GoL step is faster.
+    """
+
+    def __init__(self, board, tileSize=TILE_SIZE):
+        board = np.asarray(board)
+        self.width, self.height = board.shape
+        self.tileSize = tileSize
+        self.tilesX = -(-self.width // tileSize)
+        self.tilesY = -(-self.height // tileSize)
+
+        # Two boards with a dead border of one cell. Stable tiles are identical in both, so they never need copying
+        self._current = np.zeros((self.width + 2, self.height + 2), dtype=bool)
+        self._current[1:-1, 1:-1] = board
+        self._next = self._current.copy()
+
+        self.changeMask = np.ones((self.tilesX, self.tilesY), dtype=bool)
+        self._untrackedSteps = 0
+
+        # Scratch buffers, reused every generation. _changed is padded to whole tiles
+        self._neighbours = np.empty((self.width, self.height), dtype=np.uint8)
+        self._changed = np.zeros((self.tilesX * tileSize, self.tilesY * tileSize), dtype=bool)
+
+    def toBoard(self):
+        return self._current[1:-1, 1:-1].copy()
+
+    def getXY(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError
+        return self._current[x + 1, y + 1]
+
+    def activeTiles(self):
+        """Tiles that have to be recomputed for the next generation: changed tiles and their neighbours."""
+        padded = np.pad(self.changeMask, 1)
+        active = np.zeros_like(self.changeMask)
+        for dx in range(3):
+            for dy in range(3):
+                active |= padded[dx:dx + self.tilesX, dy:dy + self.tilesY]
+        return active
+
+    def step(self, n=1):
+        for _ in range(n):
+            self._singlestep()
+
+    def _singlestep(self):
+        if 0 < self._untrackedSteps < FULL_STEP_CHECK:
+            self._nextCells(0, self.width, 0, self.height)
+            self.changeMask.fill(True)
+            self._untrackedSteps += 1
+        else:
+            active = self.activeTiles()
+            if active.mean() > FULL_STEP_RATIO:
+                self._fullStep()
+                self._untrackedSteps = 1
+            else:
+                self._tileStep(active)
+                self._untrackedSteps = 0
+        # Tiles that were not recomputed still hold the previous generation in _next, which is equal to the current
+        # one. Tiles that were recomputed are up to date. So the buffers can simply be swapped.
+        self._current, self._next = self._next, self._current
+
+    def _nextCells(self, x0, x1, y0, y1):
+        """Computes the cells x0 <= x < x1, y0 <= y < y1 into _next and returns them and their current state."""
+        N = neighbourSum(self._current[x0:x1 + 2, y0:y1 + 2].view(np.uint8), self._neighbours[x0:x1, y0:y1])
+        alive = self._current[x0 + 1:x1 + 1, y0 + 1:y1 + 1]
+        nextCells = self._next[x0 + 1:x1 + 1, y0 + 1:y1 + 1]
+        np.bitwise_or(N, alive.view(np.uint8), out=N)  # N | alive == 3 for N == 3 or N == 2 and alive
+        np.equal(N, 3, out=nextCells)
+        return nextCells, alive
+
+    def _fullStep(self):
+        ts = self.tileSize
+        nextCells, alive = self._nextCells(0, self.width, 0, self.height)
+        np.not_equal(nextCells, alive, out=self._changed[:self.width, :self.height])
+        # Reduce the x-rows of every tile row first, reductions along contiguous rows are much faster
+        changedRows = np.logical_or.reduce(self._changed.reshape(self.tilesX, ts, -1), axis=1)
+        self.changeMask = changedRows.reshape(self.tilesX, self.tilesY, ts).any(axis=2)
+
+    def _tileStep(self, active):
+        ts = self.tileSize
+        changeMask = np.zeros_like(self.changeMask)
+
+        for tileX in np.flatnonzero(active.any(axis=1)):
+            x0, x1 = tileX * ts, min((tileX + 1) * ts, self.width)
+
+            # Contiguous runs of active tiles in this tile row are computed in one go
+            row = np.concatenate(([False], active[tileX], [False]))
+            edges = np.flatnonzero(row[1:] != row[:-1])
+            for startTile, endTile in zip(edges[::2], edges[1::2]):
+                y0, y1 = startTile * ts, min(endTile * ts, self.height)
+
+                nextCells, alive = self._nextCells(x0, x1, y0, y1)
+                changed = np.not_equal(nextCells, alive, out=self._changed[x0:x1, y0:y1])
+                changeMask[tileX, startTile:endTile] = np.logical_or.reduceat(changed.any(axis=0),
+                                                                              np.arange(0, y1 - y0, ts))
+        self.changeMask = changeMask
@@ -7,6 +7,15 @@ from utils import boardIO
 DEPTH = 0
 ENABLE_TIMEIT = False
 
+# Boundary modes of GoL: cells outside of the board are dead, alive, or the board wraps around (torus)
+BOUNDARY_DEAD = "dead"
+BOUNDARY_ALIVE = "alive"
+BOUNDARY_TORUS = "torus"
+
+# Keyframe interval and default memory budget in bytes of GoLHistory
+HISTORY_KEYFRAMES = 32
+HISTORY_BUDGET = 64 * 2 ** 20
+
 
 def timeit(func):
     def wrapped(*args, **kwargs):
@@ -24,51 +33,212 @@ def timeit(func):
 
 
 class GoL:
-    def __init__(self, initBoard, countEdge=False):
+    def __init__(self, initBoard, countEdge=False, engine=None, boundary=None, historyBudget=0):
         self.width, self.height = len(initBoard), len(initBoard[0])
         self.name = f"{self.width}x{self.height}"
 
         self.generation = 0
 
+        # Optional simulation backend, e.g. engines.bitPacked.BitPackedEngine. Called with the current board and
+        # has to provide step(n) and toBoard(). The dense board is only materialized when it is accessed.
+        self.engineFactory = engine
+        self.engine = None
+        self._engineAhead = False
+
+        # Recorded generations for seek, e.g. to step backwards. Costs a bit-packed copy of every generation
+        self.history = GoLHistory((self.width, self.height), historyBudget) if historyBudget > 0 else None
+        self._historyCurrent = False  # Whether the board is recorded as the current generation
+
         self.oldBoard = self.newBoard(0)
-        self.board = np.asarray(initBoard)
+        self.board = boardIO.asBoard(initBoard)
         self._initialBoard = self.board
-        self.countEdge = countEdge
+
+        # countEdge=True is the same as boundary=BOUNDARY_ALIVE. Engines only simulate dead cells behind the edge.
+        if boundary is None:
+            boundary = BOUNDARY_ALIVE if countEdge else BOUNDARY_DEAD
+        if boundary not in (BOUNDARY_DEAD, BOUNDARY_ALIVE, BOUNDARY_TORUS):
+            raise ValueError(f"Unknown boundary mode: {boundary}")
+        if engine is not None and boundary != BOUNDARY_DEAD:
+            raise ValueError(f"Boundary mode {boundary} is not supported by engines")
+        self.boundary = boundary
+        self.countEdge = boundary == BOUNDARY_ALIVE
+        self._halo = None  # Board with a border of one cell, reused every generation
+        self._neighbours = None
         if initBoard is None:
             self.initRandom()
 
         self.livingCells = property(self._countLivingCells)
 
+    @property
+    def board(self):
+        if self._engineAhead:
+            self._board = self.engine.toBoard()
+            self._engineAhead = False
+        return self._board
+
+    @board.setter
+    def board(self, value):
+        self._board = value
+        self._engineAhead = False
+        self.engine = None  # Engine state is outdated, recreated by getEngine
+        self._neighbourCounts = None
+        self._hash = None
+        self._historyCurrent = False
+
     def reset(self):
+        """Back to generation 0. With history the recorded generation 0 is restored, which includes edits to it."""
+        if self.history is not None and 0 in self.history:
+            self.seek(0)
+            return
         self.board = self._initialBoard
+        self.generation = 0
+
+    def getEngine(self):
+        """The engine at the current generation, created from the board if needed. None without engine."""
+        if self.engine is None and self.engineFactory is not None:
+            self.engine = self.engineFactory(self.board)
+        return self.engine
 
     def getXY(self, x, y):
+        engine = self.getEngine()
+        if engine is not None and hasattr(engine, "getXY"):
+            return engine.getXY(x, y)
         return self.board[x, y]
 
+    def getRegion(self, xMin, yMin, xMax, yMax):
+        """
+        Cells with xMin <= x < xMax and yMin <= y < yMax. Cells outside of the board are dead, unless the engine
+        simulates an unbounded universe.
+        """
+        engine = self.getEngine()
+        if engine is not None and hasattr(engine, "getRegion"):
+            return engine.getRegion(xMin, yMin, xMax, yMax)
+        return boardIO.boardRegion(self.board, xMin, yMin, xMax, yMax)
+
+    def neighbourCounts(self):
+        """Number of living neighbours of every cell, computed once per generation."""
+        if self._neighbourCounts is None:
+            self._neighbourCounts = self._countNeighbours(np.empty((self.width, self.height), dtype=np.uint8))
+        return self._neighbourCounts
+
+    def boardHash(self):
+        """boardIO.hashBoard of the current board, computed once per generation."""
+        if self._hash is None:
+            self._hash = boardIO.hashBoard(self.board)
+        return self._hash
+
+    def getNeighbourRegion(self, xMin, yMin, xMax, yMax):
+        """
+        neighbourCounts of the cells with xMin <= x < xMax and yMin <= y < yMax, 0 outside of the board unless the
+        engine simulates an unbounded universe.
+        """
+        if hasattr(self.getEngine(), "getRegion"):
+            return boardIO.regionNeighbours(self, xMin, yMin, xMax, yMax)
+        return boardIO.boardRegion(self.neighbourCounts(), xMin, yMin, xMax, yMax)
+
     def setXY(self, x, y, value):
-        self.board[x, y] = value
+        engine = self.getEngine()
+        if engine is not None and hasattr(engine, "setXY"):
+            engine.setXY(x, y, value)
+            self._engineAhead = True
+            self._neighbourCounts = None
+            self._hash = None
+            self._historyCurrent = False
+            return
+        board = self.board
+        if board is self._initialBoard:
+            board = board.copy()  # Kept for reset
+        board[x, y] = value
+        self.board = board
 
     def _countLivingCells(self):
         return np.sum(self.board)
 
     @timeit
     def step(self, n=1):
+        if self.history is not None:
+            for i in range(n):
+                self._historyStep()
+            return
+        if self.engineFactory is not None:
+            self._engineStep(n)
+            return
         for i in range(n):
             self._singlestep()
 
+    def _engineStep(self, n):
+        self.getEngine().step(n)
+        self._engineAhead = True
+        self._neighbourCounts = None
+        self._hash = None
+        self.generation += n
+
+    def _historyStep(self):
+        """Replays the next generation if it is recorded (e.g. after seek), otherwise simulates and records it."""
+        if not self._historyCurrent:
+            self.history.record(self.generation, self.board)
+        if self.generation + 1 in self.history:
+            self.board = self.history.board(self.generation + 1)
+            self.generation += 1
+        else:
+            if self.engineFactory is not None:
+                self._engineStep(1)
+            else:
+                self._singlestep()
+            self.history.record(self.generation, self.board)
+        self._historyCurrent = True
+
+    def seek(self, generation):
+        """
+        Restores a recorded generation, earlier or later than the current one. Changing the board discards the
+        recorded generations after it. Engines with an unbounded universe only get the board back.
+        """
+        if self.history is None:
+            raise ValueError("GoL has no history, create it with historyBudget > 0")
+        if not self._historyCurrent:
+            self.history.record(self.generation, self.board)
+        self.board = self.history.board(generation)
+        self.generation = generation
+        self._historyCurrent = True
+
     @timeit
     def _singlestep(self):
-        G = self.board.astype(int)
-        N = np.zeros_like(G)
-        G = np.pad(G, pad_width=1, mode='constant', constant_values=0)
-        N[:, :] = (G[:-2, :-2] + G[:-2, 1:-1] + G[:-2, 2:] +
-                   G[1:-1, :-2] + G[1:-1, 2:] +
-                   G[2:, :-2] + G[2:, 1:-1] + G[2:, 2:])
-
-        self.board = np.logical_or(N == 3, np.logical_and(G[1:-1, 1:-1] == 1, N == 2))
+        if self._neighbours is None:
+            self._neighbours = np.empty((self.width, self.height), dtype=np.uint8)
+        N = self._countNeighbours(self._neighbours)
+        # N | alive == 3 exactly for N == 3 or N == 2 and alive, so the new board is the only allocation
+        np.bitwise_or(N, self._halo[1:-1, 1:-1].view(np.uint8), out=N)
+        self.board = N == 3
 
         self.generation += 1
 
+    def _countNeighbours(self, out):
+        """Writes the neighbour counts of the current board into out. Leaves the bordered board in _halo."""
+        if self._halo is None:
+            self._halo = np.full((self.width + 2, self.height + 2), self.boundary == BOUNDARY_ALIVE, dtype=bool)
+        H = self._halo
+        H[1:-1, 1:-1] = self.board
+        if self.boundary == BOUNDARY_TORUS:
+            H[0, 1:-1] = H[-2, 1:-1]
+            H[-1, 1:-1] = H[1, 1:-1]
+            H[:, 0] = H[:, -2]
+            H[:, -1] = H[:, 1]
+
+        return boardIO.neighbourSum(H.view(np.uint8), out)
+
+    def snapshot(self, region=None):
+        """
+        Independent copy of the current generation, e.g. to render it while the simulation continues. For engines
+        with an unbounded universe the cells of region (xMin, yMin, xMax, yMax) are copied as well, getRegion of
+        the copy returns them.
+        """
+        snapshot = GoL(np.array(self.board), boundary=self.boundary)
+        snapshot.name = self.name
+        snapshot.generation = self.generation
+        if region is not None and hasattr(self.getEngine(), "getRegion"):
+            snapshot.engine = RegionSnapshot(np.array(self.getRegion(*region)), *region[:2])
+        return snapshot
+
     def clearBoard(self):
         self.board = self.newBoard()
 
@@ -78,6 +248,9 @@ class GoL:
             for ii in range(3):
                 thisX = x + i - 1
                 thisY = y + ii - 1
+                if self.boundary == BOUNDARY_TORUS:
+                    thisX %= self.width
+                    thisY %= self.height
                 if thisX < 0 or thisY < 0:
                     sum_ += self.countEdge
                     continue
@@ -88,7 +261,186 @@ class GoL:
         return sum_
 
     def newBoard(self, initValue: int = 0):
-        return np.full((self.width, self.height), initValue)
+        return np.full((self.width, self.height), initValue, dtype=boardIO.BOARD_DTYPE)
 
     def initRandom(self):
         self.board = boardIO.createRandomBoard(self.width, self.height)
+
+
+class RegionSnapshot:
+    """Engine of GoL.snapshot that keeps the cells of one region of an unbounded universe. Cannot be stepped."""
+
+    def __init__(self, cells, originX, originY):
+        self.cells = cells
+        self.originX, self.originY = originX, originY
+
+    def getRegion(self, xMin, yMin, xMax, yMax):
+        return boardIO.boardRegion(self.cells, xMin, yMin, xMax, yMax, self.originX, self.originY)
+
+
+class GoLHistory:
+    """
+    Generations of a GoL in memory. Every keyframeInterval-th generation is stored bit-packed, the others as the
+    changed bytes of the bit-packed XOR with the previous generation. When more than budget bytes are used, the
+    oldest keyframe and its deltas are dropped.
+    """
+
+    def __init__(self, shape, budget=HISTORY_BUDGET, keyframeInterval=HISTORY_KEYFRAMES):
+        self.shape = tuple(shape)
+        self.budget = budget
+        self.keyframeInterval = keyframeInterval
+        self.clear()
+
+    def clear(self, start=0):
+        self.start = start  # Generation of the first record
+        self.nbytes = 0
+        self._records = []
+        self._lastPacked = None
+        self._cursor = None  # (generation, packed board) of the last decoded generation
+
+    @property
+    def end(self):
+        """Generation after the last record."""
+        return self.start + len(self._records)
+
+    def __contains__(self, generation):
+        return self.start <= generation < self.end
+
+    def record(self, generation, board):
+        """Stores the board of a generation. Recorded later generations are dropped, they belong to another past."""
+        if not self.start <= generation <= self.end:
+            self.clear(generation)
+        elif generation < self.end:
+            self._truncate(generation)
+
+        packed = np.packbits(np.asarray(board) != 0)
+        if len(self._records) % self.keyframeInterval == 0:
+            entry = packed
+        else:
+            delta = packed ^ self._lastPacked
+            changed = np.flatnonzero(delta)
+            entry = (changed.astype(np.uint32), delta[changed]) if 5 * len(changed) < len(delta) else delta
+        self._records.append(entry)
+        self.nbytes += _nbytes(entry)
+        self._lastPacked = packed
+
+        while self.nbytes > self.budget and len(self._records) > self.keyframeInterval:
+            dropped = self._records[:self.keyframeInterval]
+            del self._records[:self.keyframeInterval]
+            self.nbytes -= sum(_nbytes(entry) for entry in dropped)
+            self.start += self.keyframeInterval
+
+    def _truncate(self, generation):
+        self.nbytes -= sum(_nbytes(entry) for entry in self._records[generation - self.start:])
+        del self._records[generation - self.start:]
+        self._lastPacked = self._packed(generation - 1) if generation > self.start else None
+        self._cursor = None
+
+    def _packed(self, generation):
+        i = generation - self.start
+        keyframe = i - i % self.keyframeInterval
+        if self._cursor is not None and keyframe <= self._cursor[0] - self.start <= i:
+            j, packed = self._cursor[0] - self.start, self._cursor[1].copy()
+        else:
+            j, packed = keyframe, self._records[keyframe].copy()
+        for entry in self._records[j + 1:i + 1]:
+            if isinstance(entry, tuple):
+                packed[entry[0]] ^= entry[1]
+            else:
+                packed ^= entry
+        self._cursor = generation, packed
+        return packed
+
+    def board(self, generation):
+        if generation not in self:
+            raise IndexError(f"Generation {generation} is not recorded ({self.start} to {self.end - 1})")
+        cells = np.unpackbits(self._packed(generation), count=self.shape[0] * self.shape[1])
+        return cells.reshape(self.shape).view(bool)
+
+
+def _nbytes(entry):
+    return sum(array.nbytes for array in entry) if isinstance(entry, tuple) else entry.nbytes
+
+
+class GoLBatch:
+    """
+    N independent boards of the same size, stored as one (N, width, height) array and advanced with a single
+    vectorized update. Boards can be deactivated (aborted), replaced or dropped without stopping the others.
+    """
+
+    def __init__(self, initBoards):
+        self.boards = np.asarray(initBoards).astype(bool)
+        self.n, self.width, self.height = self.boards.shape
+        self.name = f"{self.n}x{self.width}x{self.height}"
+
+        self.generations = np.zeros(self.n, dtype=int)
+        self.active = np.ones(self.n, dtype=bool)
+
+        # Last two generations, used to detect stagnated boards
+        self._previous = [np.zeros_like(self.boards), np.zeros_like(self.boards)]
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        return self.boards[i]
+
+    def toGoL(self, i):
+        gol = GoL(self.boards[i].copy())
+        gol.generation = int(self.generations[i])
+        return gol
+
+    @timeit
+    def step(self, n=1, abortCondition=None):
+        """
+        Advances all active boards. abortCondition is called with the batch after every generation and returns a
+        boolean mask of boards to deactivate, e.g. GoLBatch.stagnated.
+        """
+        for i in range(n):
+            if not self.active.any():
+                return
+            self._singlestep()
+            if abortCondition is not None:
+                self.abort(abortCondition(self))
+
+    def _singlestep(self):
+        allActive = self.active.all()
+        indices = slice(None) if allActive else np.flatnonzero(self.active)
+        board = self.boards[indices]
+
+        G = np.pad(board.view(np.uint8), pad_width=((0, 0), (1, 1), (1, 1)), mode='constant', constant_values=0)
+        N = boardIO.neighbourSum(G)
+        nextBoard = np.logical_or(N == 3, np.logical_and(board, N == 2))
+
+        self._previous = [self.boards, self._previous[0]]
+        if allActive:
+            self.boards = nextBoard
+        else:
+            self.boards = self.boards.copy()
+            self.boards[indices] = nextBoard
+        self.generations[indices] += 1
+
+    def stagnated(self, *args):
+        """Mask of boards that are static or alternate with period 2."""
+        unchanged = ~np.any(self.boards != self._previous[0], axis=(1, 2))
+        period2 = ~np.any(self.boards != self._previous[1], axis=(1, 2))
+        return unchanged | period2
+
+    def abort(self, mask):
+        self.active &= ~np.asarray(mask, dtype=bool)
+
+    def replace(self, i, board):
+        self.boards[i] = np.asarray(board).astype(bool)
+        for previous in self._previous:
+            previous[i] = False
+        self.generations[i] = 0
+        self.active[i] = True
+
+    def drop(self, mask):
+        """Removes all boards where mask is True."""
+        keep = ~np.asarray(mask, dtype=bool)
+        self.boards = self.boards[keep]
+        self._previous = [previous[keep] for previous in self._previous]
+        self.generations = self.generations[keep]
+        self.active = self.active[keep]
+        self.n = len(self.boards)
@@ -85,6 +85,6 @@ class GoLImageRenderer:
         self.renderSettings.texts.append((position, text, color))
 
     def renderImage(self, gol: GoL):
-        if not isinstance(gol, GoL):
+        if not isinstance(gol, GoL) and not hasattr(gol, "getRegion"):  # e.g. boardIO.MappedBoard
             gol = GoL(gol)
         return self.renderer(gol, self.renderSettings)
@@ -2,10 +2,11 @@ import datetime
 import time
 
 import math
+import numpy as np
 import pygame
 
 import utils.colormaps as cm
-from gol import timeit, GoL
+from gol import HISTORY_BUDGET, timeit, GoL
 from utils import boardIO
 
 pygame.init()
@@ -29,7 +30,7 @@ class DRAW:
 
 class GoLPygame(GoL):
     def __init__(self, initBoard=None, colormap=cm.COLORMAP_BLACK_WHITE):
-        super().__init__(initBoard)
+        super().__init__(initBoard, historyBudget=HISTORY_BUDGET)
         size = (900, 900)
         self.canvas = pygame.display.set_mode(size, pygame.RESIZABLE)
         pygame.display.set_caption("Game of Life")
@@ -37,6 +38,8 @@ class GoLPygame(GoL):
         self.camTopLeft = (0, 0)
         self.camCellWidth = max(size[0] / self.width, size[1] / self.height)
         self.neighboursFont = None
+        self._glyphCache = {}
+        self._gridCache = None
         self._updateNeighboursFont()
         self.camZoomStep = 0.5
         self.camOldDrag = None
@@ -57,12 +60,22 @@ class GoLPygame(GoL):
         self.colorMap = colormap
         # print(colormap[0][0])
 
+        # Decoupled mode: as many generations per frame as fit into the frame time (limited by delay), frames are
+        # rendered at targetFps. Otherwise at most one generation per frame.
+        self.decoupled = True
+        self.targetFps = 30
+        self._pendingGenerations = 0
+        self._renderTime = 0
+        self._statsStart = time.time()
+        self._statsGenerations = 0
+        self._statsFrames = 0
+
     @timeit
     def updateCanvas(self):
         # Clear board
         self.canvas.fill(COLOR_BG)
 
-        # Draw cells
+        # Draw cells: the visible part of the board is turned into one surface and scaled to the cell width
         cw = self.camCellWidth
         _, _, w, h = self.canvas.get_rect()
         tlX, tlY = self.camTopLeft
@@ -70,28 +83,25 @@ class GoLPygame(GoL):
         minY = max(0, int(tlY))
         maxX = min(int(minX + w / cw) + 2, self.width)
         maxY = min(int(minY + h / cw) + 2, self.height)
-        for x in range(minX, maxX):
-            for y in range(minY, maxY):
-                # for x in range(0, maxX):
-                #     for y in range(0, maxY):
-                if self.getXY(x, y):
-                    on = self.colorMap[-1]
-                    off = self.colorMap[0]
-                else:
-                    on = self.colorMap[0]
-                    off = self.colorMap[-1]
-                    if self.showHistory:
-                        on = self.colorMap[int(self.oldBoard[x][y] * 255)]
-
-                self.drawRect(x, y, on)
-                if self.drawGridlines:
-                    self.drawRect(x, y, self.colorMap[-1], max(1, self.camCellWidth * 0.05))
-
-                if self.drawNeighbors:
-                    nb = self.countNeighbours(x, y)
-                    if nb == 0:
-                        continue
-                    self.drawText(int(nb - self.getXY(x, y)), x, y, off)
+        if minX < maxX and minY < maxY:
+            cells = self.getRegion(minX, minY, maxX, maxY) != 0
+            offColors = self.colorMap[np.zeros(cells.shape, dtype=int)]
+            if self.showHistory:
+                offColors = self.colorMap[(np.asarray(self.oldBoard)[minX:maxX, minY:maxY] * 255).astype(int)]
+            pixels = np.where(cells[..., None], self.colorMap[-1], offColors)
+
+            left, top = int((minX - tlX) * cw), int((minY - tlY) * cw)
+            cellsRect = pygame.Rect(left, top, int((maxX - tlX) * cw) - left + 1, int((maxY - tlY) * cw) - top + 1)
+            cellsSurface = pygame.transform.scale(pygame.surfarray.make_surface(pixels), cellsRect.size)
+            self.canvas.blit(cellsSurface, cellsRect)
+
+            if self.drawGridlines:
+                self.canvas.set_clip(cellsRect)
+                self.canvas.blit(self._gridOverlay(), ((int(tlX) - tlX) * cw, (int(tlY) - tlY) * cw))
+                self.canvas.set_clip(None)
+
+            if self.drawNeighbors:
+                self._drawNeighbourCounts(cells, minX, minY, maxX, maxY)
 
         # Draw mouse position
         x, y = pygame.mouse.get_pos()
@@ -109,27 +119,64 @@ class GoLPygame(GoL):
         pygame.image.save(self.canvas, "data/img.jpg")
 
     def start(self):
+        clock = pygame.time.Clock()
         while not self.done:
             # Events
             self._eventHandling()
 
             # Execution
-            if self.simulate and (time.time() - self.lastupdate) > self.delay:
+            frameStart = time.time()
+            if self.simulate and self.decoupled:
+                self._simulateUntil(frameStart + 1 / self.targetFps - self._renderTime)
+            elif self.simulate and (time.time() - self.lastupdate) > self.delay:
                 self.lastupdate = time.time()
                 self.step()
+                self._statsGenerations += 1
 
             # Update
+            renderStart = time.time()
             try:
                 self.updateCanvas()
             except pygame.error:
                 pass
+            self._renderTime = time.time() - renderStart
+            self._statsFrames += 1
+            self._updateTitle()
 
             # Record
             if self.record:
                 self.saveScreenshot()
 
+            if self.decoupled or not self.simulate:
+                clock.tick(self.targetFps)
+
         pygame.quit()
 
+    def _simulateUntil(self, deadline):
+        """Runs the generations that are due since the last frame, but at least one and only until deadline."""
+        now = time.time()
+        self._pendingGenerations += (now - self.lastupdate) / self.delay
+        self.lastupdate = now
+        first = True
+        while self._pendingGenerations >= 1 and (first or time.time() < deadline):
+            self.step()
+            self._pendingGenerations -= 1
+            self._statsGenerations += 1
+            first = False
+        self._pendingGenerations = min(self._pendingGenerations, 1)  # Generations that did not fit are dropped
+
+    def _updateTitle(self):
+        elapsed = time.time() - self._statsStart
+        if elapsed < 0.5:
+            return
+        generationsPerSecond = self._statsGenerations / elapsed
+        framesPerSecond = self._statsFrames / elapsed
+        pygame.display.set_caption(f"Game of Life - Generation {self.generation} - "
+                                   f"{generationsPerSecond:.0f} gen/s, {framesPerSecond:.1f} fps")
+        self._statsStart = time.time()
+        self._statsGenerations = 0
+        self._statsFrames = 0
+
         # Event bindings
 
     def _eventHandling(self):
@@ -197,11 +244,15 @@ class GoLPygame(GoL):
             pygame.quit()
         elif c == "g":
             self.drawGridlines = not self.drawGridlines
+        elif c == "d":  # Toggle decoupled simulation
+            self.decoupled = not self.decoupled
         elif c == "h":
             self.showHistory = not self.showHistory
         elif c == " ":
             self.step()
             self.updateCanvas()
+        elif c == "b":  # Step back
+            self.stepBack()
         elif c == "w":
             boardIO.saveBoard(self.board, f"data/boards/saving/{self.boardName}_{self.generation:05d}")
         elif c == "r":
@@ -219,6 +270,14 @@ class GoLPygame(GoL):
 
     def togglePause(self):
         self.simulate = not self.simulate
+        self.lastupdate = time.time()
+        self._pendingGenerations = 0
+
+    def stepBack(self):
+        if self.generation - 1 in self.history:
+            self.simulate = False
+            self.seek(self.generation - 1)
+            self.updateCanvas()
 
     def toggleNumberNeighbors(self):
         self.drawNeighbors = not self.drawNeighbors
@@ -299,6 +358,45 @@ class GoLPygame(GoL):
         curTlX, curTlY = (x - tlX) * cw, (y - tlY) * cw
         pygame.draw.rect(self.canvas, color, (curTlX, curTlY, cw + 1, cw + 1), int(width))
 
+    def _gridOverlay(self):
+        """Transparent surface with the gridlines of all cells that fit on the canvas. Rebuilt on zoom/resize."""
+        cw = self.camCellWidth
+        _, _, w, h = self.canvas.get_rect()
+        color = tuple(int(c) for c in self.colorMap[-1])
+        key = (cw, w, h, color)
+        if self._gridCache is None or self._gridCache[0] != key:
+            nX, nY = int(w / cw) + 2, int(h / cw) + 2
+            overlay = pygame.Surface((int(nX * cw) + 1, int(nY * cw) + 1), pygame.SRCALPHA)
+            lineWidth = int(max(1, cw * 0.05))
+            for x in range(nX + 1):
+                overlay.fill(color, (int(x * cw), 0, lineWidth, overlay.get_height()))
+            for y in range(nY + 1):
+                overlay.fill(color, (0, int(y * cw), overlay.get_width(), lineWidth))
+            self._gridCache = (key, overlay)
+        return self._gridCache[1]
+
+    def _glyphs(self, color):
+        """Rendered digits 0-8 in one color, cached until the font changes."""
+        color = tuple(int(c) for c in color)
+        if color not in self._glyphCache:
+            self._glyphCache[color] = [self.neighboursFont.render(str(i), False, color) for i in range(9)]
+        return self._glyphCache[color]
+
+    def _drawNeighbourCounts(self, cells, minX, minY, maxX, maxY):
+        counts = self.neighbourCounts()[minX:maxX, minY:maxY]
+        # Digits on dead cells are drawn with the on color and vice versa
+        glyphs = np.empty(18, dtype=object)
+        glyphs[:9] = self._glyphs(self.colorMap[-1])
+        glyphs[9:] = self._glyphs(self.colorMap[0])
+        sizes = np.array([txt.get_size() for txt in glyphs])
+
+        xs, ys = np.nonzero(cells | (counts > 0))
+        index = counts[xs, ys] + 9 * cells[xs, ys]
+        tlX, tlY = self.camTopLeft
+        cw = self.camCellWidth
+        positions = np.stack(((xs + minX - tlX) * cw, (ys + minY - tlY) * cw), axis=1) + (cw - sizes[index]) / 2 - 1
+        self.canvas.blits(zip(glyphs[index], positions.tolist()), doreturn=False)
+
     def drawText(self, text, x, y, color):
         tlX, tlY = self.camTopLeft
         cw = self.camCellWidth
@@ -312,6 +410,7 @@ class GoLPygame(GoL):
 
     def _updateNeighboursFont(self):
         self.neighboursFont = pygame.font.SysFont('Arial', int(self.camCellWidth))
+        self._glyphCache = {}
 
     def clear(self):
         self.clearBoard()
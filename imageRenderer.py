@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
@@ -30,9 +32,334 @@ class RenderSettings:
 
 
 def renderImage(gol: GoL, settings: RenderSettings):
+    """
+    Rasterizes the viewport with NumPy: every screen pixel is mapped to a cell once per axis and the cell colors are
+    gathered in one fancy index. Neighbour counts are taken from gol.neighbourCounts and blended in from
+    pre-rasterized digit tiles. Pixel-equivalent to renderImageCellwise.
+    """
+    mapping = viewportMapping(tuple(settings.topLeft), tuple(settings.bottomRight), settings.width, settings.height,
+                              gol.width, gol.height)
+    grayValues = _grayValues(settings)
+    img = cv2.LUT(mapping.states(gol, settings.showGridlines), grayValues)
+    textScaling = 0.05
+    if settings.showNeighbours:
+        textScaling = _textScaling(mapping.scaling)
+        _drawNeighbours(img, gol, mapping, grayValues, settings.showGridlines, textScaling)
+    coloredImg = cm.colorize(img, settings.colormap)
+    _drawExtras(coloredImg, settings, mapping.xMin, mapping.yMin, mapping.scaling, textScaling)
+    return coloredImg
+
+
+# Pixel states of a rendered viewport
+STATE_OFF, STATE_ON, STATE_EMPTY, STATE_GRID = range(4)
+
+
+def _grayValues(settings: RenderSettings):
+    """Lookup table from pixel states to the gray values that are colorized afterwards."""
+    grayValues = np.zeros(256, dtype="B")
+    values = [settings.offColorIndex, settings.onColorIndex, 0, 255]
+    grayValues[:len(values)] = np.clip(np.rint(values), 0, 255)
+    return grayValues
+
+
+class ViewportMapping:
+    """
+    Screen to cell mapping of one viewport. Independent of the board content, so it is computed once and reused for
+    every frame with the same viewport (see viewportMapping).
+    """
+
+    def __init__(self, topLeft, bottomRight, width, height, boardWidth, boardHeight):
+        self.width = width
+        self.height = height
+
+        self.xMin, self.yMin = topLeft
+        self.xMax, self.yMax = bottomRight
+        if self.xMax < 0:
+            self.xMax += boardWidth
+        if self.yMax < 0:
+            self.yMax += boardHeight
+        self.scaling = min(width / (self.xMax - self.xMin + 1), height / (self.yMax - self.yMin + 1))
+
+        (self.xs, self.coveredX, self.gridX, self.borderX,
+         self.fromStartX, self.fromEndX, self.fromNextEndX) = _axisMapping(self.xMin, self.xMax, self.scaling, width)
+        (self.ys, self.coveredY, self.gridY, self.borderY,
+         self.fromStartY, self.fromEndY, self.fromNextEndY) = _axisMapping(self.yMin, self.yMax, self.scaling, height)
+
+        # Indices into the region of cells that is visible
+        self.regionX = self.xs - self.xs[0]
+        self.regionY = self.ys - self.ys[0]
+        self._overlays = {}
+
+    def regionBounds(self):
+        return self.xs[0], self.ys[0], self.xs[-1] + 1, self.ys[-1] + 1
+
+    def cells(self, gol: GoL):
+        """Whether the cell at each pixel is alive, shape (height, width)."""
+        region = gol.getRegion(*self.regionBounds()) != 0
+        return region.T[self.regionY][:, self.regionX]
+
+    def overlay(self, showGridlines):
+        """Pixels that do not show a cell: STATE_EMPTY/STATE_GRID where set, 0 where the cell state is shown."""
+        if showGridlines not in self._overlays:
+            covered = np.outer(self.coveredY, self.coveredX)
+            overlay = np.where(covered, 0, STATE_EMPTY).astype("B")
+            if showGridlines:
+                grid = covered & (self.gridY[:, None] | self.gridX[None, :])
+                grid |= np.outer(self.coveredY, self.borderX) | np.outer(self.borderY, self.coveredX)
+                overlay[grid] = STATE_GRID
+            self._overlays[showGridlines] = overlay
+        return self._overlays[showGridlines]
+
+    def cellMask(self, showGridlines=False):
+        """Pixels that show a cell state, i.e. no gridline and inside of the drawn cells."""
+        key = ("cellMask", showGridlines)
+        if key not in self._overlays:
+            self._overlays[key] = self.overlay(showGridlines) == 0
+        return self._overlays[key]
+
+    def pixelRanges(self):
+        """First and last + 1 pixel column/row of every cell in the visible region."""
+        if "pixelRanges" not in self._overlays:
+            xCells = np.arange(self.regionX[-1] + 1)
+            yCells = np.arange(self.regionY[-1] + 1)
+            self._overlays["pixelRanges"] = (np.searchsorted(self.regionX, xCells, side="left"),
+                                             np.searchsorted(self.regionX, xCells, side="right"),
+                                             np.searchsorted(self.regionY, yCells, side="left"),
+                                             np.searchsorted(self.regionY, yCells, side="right"))
+        return self._overlays["pixelRanges"]
+
+    def states(self, gol: GoL, showGridlines=False):
+        # Overlay states are bigger than STATE_ON, so they win
+        return np.maximum(self.overlay(showGridlines), self.cells(gol).view("B"))
+
+
+# Animated zooms often revisit the same viewports, so a few recent mappings are kept
+VIEWPORT_CACHE_SIZE = 32
+
+
+@lru_cache(maxsize=VIEWPORT_CACHE_SIZE)
+def viewportMapping(topLeft, bottomRight, width, height, boardWidth, boardHeight):
+    return ViewportMapping(topLeft, bottomRight, width, height, boardWidth, boardHeight)
+
+
+class IncrementalRenderer:
+    """
+    Renderer that keeps the previous frame and only repaints the pixel blocks of cells that flipped since the last
+    call. Falls back to a full redraw when the viewport, gridlines, colors or colormap change or too many cells
+    flipped. Stateful, so every video needs its own instance and frames have to be rendered in order.
+
+    Usage: GoLVideoRenderer(..., renderer=IncrementalRenderer())
+    """
+    stateful = True  # GoLVideoRenderer renders the frames in order on one thread
+
+    def __init__(self, maxChangedRatio=0.05):
+        self.maxChangedRatio = maxChangedRatio
+        self._key = None
+        self._colormap = None
+        self._cells = None
+        self._frame = None
+
+    def __call__(self, gol: GoL, settings: RenderSettings):
+        if settings.showNeighbours:
+            self._key = None
+            return renderImage(gol, settings)
+
+        mapping = viewportMapping(tuple(settings.topLeft), tuple(settings.bottomRight), settings.width,
+                                  settings.height, gol.width, gol.height)
+        grayValues = _grayValues(settings)
+        colormap = settings.colormap() if callable(settings.colormap) else settings.colormap
+        key = (mapping, settings.showGridlines, grayValues[:2].tobytes())
+
+        cells = gol.getRegion(*mapping.regionBounds()) != 0
+        if key != self._key or not _sameColormap(colormap, self._colormap) or cells.shape != self._cells.shape:
+            self._redraw(mapping, cells, grayValues, colormap, settings.showGridlines)
+        else:
+            flipped = np.nonzero(cells != self._cells)
+            if len(flipped[0]) > self.maxChangedRatio * cells.size:
+                self._redraw(mapping, cells, grayValues, colormap, settings.showGridlines)
+            else:
+                self._repaint(mapping, cells, flipped, grayValues, colormap, settings.showGridlines)
+        self._key = key
+        self._colormap = colormap
+        self._cells = cells
+
+        coloredImg = self._frame.copy()
+        _drawExtras(coloredImg, settings, mapping.xMin, mapping.yMin, mapping.scaling, 0.05)
+        return coloredImg
+
+    def _redraw(self, mapping, cells, grayValues, colormap, showGridlines):
+        states = np.maximum(mapping.overlay(showGridlines), cells.T[mapping.regionY][:, mapping.regionX].view("B"))
+        self._frame = cm.colorize(cv2.LUT(states, grayValues), colormap)
+
+    def _repaint(self, mapping, cells, flipped, grayValues, colormap, showGridlines):
+        colors = cm.colorize(grayValues[np.newaxis, :2], colormap)[0]
+        cellMask = mapping.cellMask(showGridlines)
+        if self._frame.ndim == 3:
+            cellMask = cellMask[:, :, np.newaxis]
+        x0, x1, y0, y1 = mapping.pixelRanges()
+        for x, y in zip(*flipped):
+            np.copyto(self._frame[y0[y]:y1[y], x0[x]:x1[x]], colors[int(cells[x, y])],
+                      where=cellMask[y0[y]:y1[y], x0[x]:x1[x]])
+
+
+def _sameColormap(colormap1, colormap2):
+    if colormap1 is None or colormap2 is None:
+        return colormap1 is colormap2
+    return np.array_equal(colormap1, colormap2)
+
+
+def _axisMapping(minValue, maxValue, scaling, size):
+    """
+    Maps every pixel along one axis to the cell that is drawn last at this pixel by renderImageCellwise.
+    Returns the cell per pixel, whether the pixel is covered by any cell, whether the pixel is the last one before
+    the next cell (gridline), whether the pixel is directly behind the last cell (outer gridline) and the distance
+    of the pixel to the start and the end of its cell and to the end of the next cell.
+    """
+    cells = np.arange(int(minValue), int(maxValue + 1) + 1)
+    offset = int((minValue - int(minValue) - 1) * scaling)
+    ends = ((cells + 1 - minValue) * scaling).astype(int)
+    starts = np.concatenate(([offset], ends[:-1]))
+
+    pixels = np.arange(size)
+    index = np.clip(np.searchsorted(starts, pixels, side="right") - 1, 0, len(cells) - 1)
+    covered = pixels <= ends[-1]
+    grid = (pixels == ends[index] - 1) & (index < len(cells) - 1)
+    border = pixels == ends[-1] + 1
+    nextIndex = np.minimum(index + 1, len(cells) - 1)
+    return cells[index], covered, grid, border, pixels - starts[index], pixels - ends[index], pixels - ends[nextIndex]
+
+
+@lru_cache(maxsize=None)
+def _textScaling(scaling):
+    """Font scale of the neighbour counts, same as in renderImageCellwise."""
+    textScaling = 0.05
+    while max(cv2.getTextSize("0", cv2.FONT_HERSHEY_PLAIN, textScaling, 1)[0]) < scaling * 0.9:
+        textScaling += 0.05
+    return textScaling
+
+
+# Glyph index of cells without a neighbour count (dead cells without living neighbours)
+_GLYPH_BLANK = 9
+# From this cell size on the neighbour counts are drawn glyph by glyph instead of line by line
+CELLWISE_GLYPH_SCALING = 24
+
+
+@lru_cache(maxsize=VIEWPORT_CACHE_SIZE)
+def _glyphAtlas(scaling, textScaling):
+    """Antialiased digits 0-8 rasterized once per cell size, as alpha tiles with the text origin at _glyphOrigin."""
+    size = 2 * int(scaling) + 4  # Room for digits that are bigger than the cell
+    atlas = np.zeros((_GLYPH_BLANK + 1, size, size), dtype="B")
+    for digit in range(_GLYPH_BLANK):
+        cv2.putText(atlas[digit], str(digit), _glyphOrigin(size), cv2.FONT_HERSHEY_PLAIN, textScaling, 255, 1,
+                    cv2.LINE_AA)
+    return atlas
+
+
+def _glyphOrigin(size):
+    return size // 4, size - 1 - size // 4
+
+
+def _drawNeighbours(img, gol: GoL, mapping: ViewportMapping, grayValues, showGridlines, textScaling):
+    """Blends the neighbour count of every visible cell into the gray image, in the inverted gray of the cell."""
+    bounds = mapping.regionBounds()
+    counts = gol.getNeighbourRegion(*bounds)
+    alive = gol.getRegion(*bounds) != 0
+    glyphs = np.where(alive | (counts > 0), counts, _GLYPH_BLANK).astype(np.intp).T
+    textGrays = (255 - grayValues[alive.view("B")].astype(np.int32)).T
+
+    atlas = _glyphAtlas(mapping.scaling, textScaling)
+    size = atlas.shape[1]
+    originX, originY = _glyphOrigin(size)
+
+    # Tile pixel of every screen pixel. The text origin is computed like in renderImageCellwise: from the left and
+    # the bottom edge of the cell, moved by 5% of the cell size and truncated.
+    margin = 0.05 * mapping.scaling
+    cellMask = mapping.cellMask(showGridlines)
+    # Digits are drawn cell by cell in y order, so the top of a digit can cover the bottom of the cell above,
+    # including the gridline in between
+    aboveMask = cellMask
+    if showGridlines:
+        aboveMask = cellMask | np.outer(mapping.coveredY & mapping.gridY,
+                                        mapping.coveredX & ~mapping.gridX & ~mapping.borderX)
+
+    if mapping.scaling >= CELLWISE_GLYPH_SCALING:
+        _drawGlyphs(img, mapping, glyphs, textGrays, atlas, cellMask, aboveMask, margin)
+        return
+
+    pixelsX, pixelsY = np.arange(mapping.width), np.arange(mapping.height)
+    columns = _tileIndex(originX + pixelsX - np.trunc(pixelsX - mapping.fromStartX + margin), size)
+
+    lastRow = len(glyphs) - 1
+    for regionY, fromEnd, mask in ((mapping.regionY, mapping.fromEndY, cellMask),
+                                   (np.minimum(mapping.regionY + 1, lastRow), mapping.fromNextEndY, aboveMask)):
+        rows = _tileIndex(originY + pixelsY - np.trunc(pixelsY - fromEnd - margin), size)
+        if regionY is not mapping.regionY:
+            rows[mapping.regionY == lastRow] = size - 1
+        lines = np.flatnonzero(rows != size - 1)  # Screen rows that can contain a digit
+        regionY = regionY[lines]
+        alpha = atlas[glyphs[regionY][:, mapping.regionX], rows[lines, None], columns[None, :]]
+        mask = mask[lines] & (alpha > 0)
+        lineImg = img[lines]
+        gray = lineImg[mask].astype(np.int32)
+        textGray = textGrays[regionY][:, mapping.regionX][mask]
+        lineImg[mask] = gray + ((textGray - gray) * alpha[mask].astype(np.int32) + 127) // 255
+        img[lines] = lineImg
+
+
+def _drawGlyphs(img, mapping: ViewportMapping, glyphs, textGrays, atlas, cellMask, aboveMask, margin):
+    """
+    Blends like _drawNeighbours, but glyph by glyph into the pixel block of each cell. Faster for big cells, where
+    most pixels are far away from any digit.
+    """
+    originX, originY = _glyphOrigin(atlas.shape[1])
+    # Every glyph cut to its inked pixels, with the offset of the cut in the tile
+    cuts = []
+    for tile in atlas[:_GLYPH_BLANK]:
+        rows, columns = np.flatnonzero(tile.any(axis=1)), np.flatnonzero(tile.any(axis=0))
+        cuts.append((tile[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1].astype(np.int32),
+                     columns[0] - originX, rows[0] - originY))
+
+    x0, x1, y0, y1 = mapping.pixelRanges()
+    # Screen pixel of the text origin of every cell column/row, and of the cell below
+    lefts = np.trunc(x0 - mapping.fromStartX[x0] + margin).astype(np.intp).tolist()
+    bottoms = np.trunc(y0 - mapping.fromEndY[y0] - margin).astype(np.intp).tolist()
+    belowBottoms = np.trunc(y0 - mapping.fromNextEndY[y0] - margin).astype(np.intp).tolist()
+    x0, x1, y0, y1 = x0.tolist(), x1.tolist(), y0.tolist(), y1.tolist()
+
+    for y, x in zip(*np.nonzero(glyphs != _GLYPH_BLANK)):
+        _blendGlyph(img, cellMask, cuts[glyphs[y, x]], textGrays[y, x], x0[x], x1[x], y0[y], y1[y],
+                    lefts[x], bottoms[y])
+    for y, x in zip(*np.nonzero(glyphs[1:] != _GLYPH_BLANK)):
+        _blendGlyph(img, aboveMask, cuts[glyphs[y + 1, x]], textGrays[y + 1, x], x0[x], x1[x], y0[y], y1[y],
+                    lefts[x], belowBottoms[y])
+
+
+def _blendGlyph(img, mask, cut, textGray, left, right, top, bottom, originX, originY):
+    """Blends the glyph with the text origin (originX, originY) into the pixels left <= x < right, top <= y < bottom."""
+    alpha, cutX, cutY = cut
+    cutX += originX
+    cutY += originY
+    left, right = max(left, cutX), min(right, cutX + alpha.shape[1])
+    top, bottom = max(top, cutY), min(bottom, cutY + alpha.shape[0])
+    if left >= right or top >= bottom:
+        return
+    alpha = alpha[top - cutY:bottom - cutY, left - cutX:right - cutX]
+    block = img[top:bottom, left:right]
+    gray = block.astype(np.int32)
+    # Pixels with alpha 0 keep their gray
+    np.copyto(block, gray + ((textGray - gray) * alpha + 127) // 255, casting="unsafe",
+              where=mask[top:bottom, left:right])
+
+
+def _tileIndex(index, size):
+    # Pixels outside of the tile are mapped to the last row/column, which stays empty
+    index = index.astype(np.intp)
+    return np.where((index >= 0) & (index < size), index, size - 1)
+
+
+def _viewport(gol: GoL, settings: RenderSettings):
     h = settings.height
     w = settings.width
-    img = np.zeros((h, w), dtype="B")
 
     xMin, yMin = settings.topLeft
     xMax, yMax = settings.bottomRight
@@ -42,6 +369,42 @@ def renderImage(gol: GoL, settings: RenderSettings):
         yMax += gol.height
 
     scaling = min(w / (xMax - xMin + 1), h / (yMax - yMin + 1))
+    return xMin, yMin, xMax, yMax, scaling
+
+
+def _drawExtras(coloredImg, settings: RenderSettings, xMin, yMin, scaling, textScaling):
+    font = cv2.FONT_HERSHEY_PLAIN
+    for position, text, color in settings.texts:
+        tmp1, tmp2 = position
+        x = int((tmp1 - xMin + 0.05) * scaling)
+        y = int((tmp2 - yMin + 0.95) * scaling)
+        cv2.putText(coloredImg, text, (x, y),
+                    font, textScaling, color, 1,
+                    cv2.LINE_AA)
+
+    for position, color, size in settings.highlights:
+        tmp1, tmp2 = position
+        try:
+            x1, y1 = tmp1
+            x2, y2 = tmp2
+            x1 = int((x1 - xMin) * scaling)
+            y1 = int((y1 - yMin) * scaling)
+            x2 = int((x2 - xMin) * scaling)
+            y2 = int((y2 - yMin) * scaling)
+        except:
+            x1 = int((tmp1 - xMin) * scaling)
+            y1 = int((tmp2 - yMin) * scaling)
+            x2 = int((tmp1 + 1 - xMin) * scaling)
+            y2 = int((tmp2 + 1 - yMin) * scaling)
+        cv2.rectangle(coloredImg, (x1, y1), (x2, y2), color, size)
+
+
+def renderImageCellwise(gol: GoL, settings: RenderSettings):
+    h = settings.height
+    w = settings.width
+    img = np.zeros((h, w), dtype="B")
+
+    xMin, yMin, xMax, yMax, scaling = _viewport(gol, settings)
 
     xOffset = int((xMin - int(xMin) - 1) * scaling)
     yOffset = int((yMin - int(yMin) - 1) * scaling)
@@ -81,35 +444,16 @@ def renderImage(gol: GoL, settings: RenderSettings):
         lastX = nextX
 
     coloredImg = cm.colorize(img, settings.colormap)
-    for position, text, color in settings.texts:
-        tmp1, tmp2 = position
-        x = int((tmp1 - xMin + 0.05) * scaling)
-        y = int((tmp2 - yMin + 0.95) * scaling)
-        cv2.putText(coloredImg, text, (x, y),
-                    font, textScaling, color, 1,
-                    cv2.LINE_AA)
-
-    for position, color, size in settings.highlights:
-        tmp1, tmp2 = position
-        try:
-            x1, y1 = tmp1
-            x2, y2 = tmp2
-            x1 = int((x1 - xMin) * scaling)
-            y1 = int((y1 - yMin) * scaling)
-            x2 = int((x2 - xMin) * scaling)
-            y2 = int((y2 - yMin) * scaling)
-        except:
-            x1 = int((tmp1 - xMin) * scaling)
-            y1 = int((tmp2 - yMin) * scaling)
-            x2 = int((tmp1 + 1 - xMin) * scaling)
-            y2 = int((tmp2 + 1 - yMin) * scaling)
-        cv2.rectangle(coloredImg, (x1, y1), (x2, y2), color, size)
+    _drawExtras(coloredImg, settings, xMin, yMin, scaling, textScaling)
     return coloredImg
 
 
 def fastImage(gol: GoL, settings: RenderSettings):
-    img = np.transpose(gol.board * 255).astype("B")
-    img = img[int(settings.topLeft[0]):int(settings.bottomRight[0]), int(settings.topLeft[1]):int(settings.bottomRight[1])]
+    # Rows of the image are y, columns are x. Only the sliced region is read from the board
+    ys = range(gol.height)[int(settings.topLeft[0]):int(settings.bottomRight[0])]
+    xs = range(gol.width)[int(settings.topLeft[1]):int(settings.bottomRight[1])]
+    region = gol.getRegion(xs.start, ys.start, xs.stop, ys.stop)
+    img = np.transpose(region != 0).astype("B") * np.uint8(255)
     if settings.colormap is not None:
         img = cm.colorize(img, settings.colormap)
 
@@ -1,13 +1,37 @@
+import itertools
 import os
+import random
+import sys
 import unittest
+from functools import partial
 from shutil import rmtree
 
+import utils.colormaps as cm
 from utils import boardIO
-from gol import GoL
+from utils.timeline import GenerationTimeline, loadTimeline
+from utils.videoWriters import NullVideoWriter, PipeVideoWriter
+from engines.bitPacked import BitPackedEngine
+from engines.expanding import ExpandingEngine
+from engines.hashLife import HashLifeEngine
+from engines.parallel import ParallelEngine
+from engines.sparse import SparseEngine
+from engines.tiled import TiledEngine
+from gol import BOUNDARY_ALIVE, BOUNDARY_DEAD, BOUNDARY_TORUS, GoL, GoLBatch, GoLHistory
+from VideoRenderer import AbortDifHandler, CycleDetector, GoLVideoRenderer
+from imageRenderer import (IncrementalRenderer, RenderSettings, fastImage, renderImage, renderImageCellwise,
+                           viewportMapping)
 
 TEST_DIR = "data/tests/"
 
 
+def gliderBoard(width, height):
+    """Board with a glider in the top left corner that moves by (1, 1) every 4 generations."""
+    board = boardIO.emptyBoard(width, height)
+    for x, y in [(1, 0), (2, 1), (0, 2), (1, 2), (2, 2)]:
+        board[x, y] = 1
+    return board
+
+
 class BoardIOTest(unittest.TestCase):
     SMALL_SIZE = (121, 106)
     MEDIUM_SIZE = (1500, 1751)
@@ -88,13 +112,78 @@ class BoardIOTest(unittest.TestCase):
         loadedBoard = boardIO.loadCompressedBoard(filename)
         self.assertTrue(boardIO.checkEquals(originalBoard, loadedBoard))
 
-    # def testCompressedRandomBig(self):
-    #     filename = TEST_DIR + "big.boardC"
-    #
-    #     originalBoard = boardIO.createRandomBoard(*BoardIOTest.BIG_SIZE)
-    #     boardIO.saveCompressedBoard(originalBoard, filename)
-    #     loadedBoard = boardIO.loadCompressedBoard(filename)
-    #     self.assertTrue(boardIO.checkEquals(originalBoard, loadedBoard))
+    def testCompressedRandomBig(self):
+        filename = TEST_DIR + "big.boardC"
+
+        originalBoard = boardIO.createRandomBoard(*BoardIOTest.BIG_SIZE)
+        boardIO.saveCompressedBoard(originalBoard, filename)
+        loadedBoard = boardIO.loadCompressedBoard(filename)
+        self.assertTrue(boardIO.checkEquals(originalBoard, loadedBoard))
+
+    def testCompressedFormat(self):
+        filename = TEST_DIR + "format.boardC"
+        for board, content in [([[1, 0, 1], [0, 1, 1], [1, 1, 0], [0, 0, 1]], b"\x00\x00\x04\x00\x00\x03\xa6\xd0"),
+                               ([[1, 0], [0, 1], [1, 1], [0, 1]], b"\x00\x00\x04\x00\x00\x02\xa7\x00")]:
+            boardIO.saveCompressedBoard(board, filename)
+            with open(filename, "rb") as d:
+                self.assertEqual(d.read(), content)
+            self.assertTrue(boardIO.checkEquals(boardIO.loadCompressedBoard(filename), board))
+
+    def testMappedBoard(self):
+        filename = TEST_DIR + "mapped.boardM"
+        originalBoard = boardIO.createRandomBoard(45, 37)
+        boardIO.saveMappedBoard(originalBoard, filename)
+
+        mapped = boardIO.loadMappedBoard(filename)
+        self.assertEqual(mapped.shape, (45, 37))
+        self.assertTrue(boardIO.checkEquals(mapped, originalBoard))
+        self.assertTrue(boardIO.checkEquals(mapped.getRegion(3, 9, 20, 30), originalBoard[3:20, 9:30]))
+        self.assertEqual(mapped.getXY(4, 11), originalBoard[4][11])
+
+        region = mapped.getRegion(-2, 30, 3, 40)
+        self.assertEqual(region.shape, (5, 10))
+        self.assertTrue(boardIO.checkEquals(region[2:, :7], originalBoard[:3, 30:]))
+        self.assertFalse(region[:2].any() or region[:, 7:].any())
+
+    def testMappedBoardSetRegion(self):
+        mapped = boardIO.MappedBoard.create(TEST_DIR + "created.boardM", 20, 21)
+        glider = [[0, 1, 0], [0, 0, 1], [1, 1, 1]]
+        mapped.setRegion(5, 6, glider)
+        board = boardIO.emptyBoard(20, 21)
+        board[5:8, 6:9] = glider
+        self.assertTrue(boardIO.checkEquals(boardIO.loadMappedBoard(TEST_DIR + "created.boardM"), board))
+
+    def testRLERandom(self):
+        filename = TEST_DIR + "random.rle"
+        for width, height in [(1, 1), (23, 17), (100, 3)]:
+            originalBoard = boardIO.createRandomBoard(width, height)
+            boardIO.saveRLE(originalBoard, filename)
+            loadedBoard = boardIO.loadRLE(filename)
+            self.assertEqual(loadedBoard.shape, (width, height))
+            self.assertTrue(boardIO.checkEquals(originalBoard, loadedBoard))
+
+    def testLoadRLE(self):
+        filename = TEST_DIR + "glider.rle"
+        with open(filename, "w") as d:
+            d.write("#N Glider\n#C Comment\nx = 5, y = 6, rule = B3/S23\nbo$2b\no$3o2$\n12b2o!ignored")
+        board = boardIO.emptyBoard(14, 6)
+        board[:3, :3] = [[0, 0, 1], [1, 0, 1], [0, 1, 1]]
+        board[12:14, 4] = 1
+        self.assertTrue(boardIO.checkEquals(boardIO.loadRLE(filename), board))
+
+        chunkSize = boardIO.RLE_CHUNK_SIZE
+        try:
+            boardIO.RLE_CHUNK_SIZE = 1  # Every line is tokenized on its own
+            self.assertTrue(boardIO.checkEquals(boardIO.loadRLE(filename), board))
+            (xs, ys), size = boardIO.loadRLECoordinates(filename)
+            self.assertEqual(size, (14, 6))
+            self.assertEqual(sorted(zip(xs, ys)), sorted(zip(*board.nonzero())))
+        finally:
+            boardIO.RLE_CHUNK_SIZE = chunkSize
+
+        with open(filename, "w") as d:
+            d.write("x = 3, y = 3\nbxo!")
+        self.assertRaises(ValueError, boardIO.loadRLE, filename)
 
     def testEmptyBoard(self):
         board = [
@@ -110,6 +199,11 @@ class BoardIOTest(unittest.TestCase):
 
 
 class GoLRulesTest(unittest.TestCase):
+    engine = None
+
+    def createGoL(self, board):
+        return GoL(initBoard=board, engine=self.engine)
+
     def testSmallBoard(self):
         board = [
             [1, 1, 0, 1, 0],
@@ -126,17 +220,18 @@ class GoLRulesTest(unittest.TestCase):
             [1, 1, 1, 1, 0],
             [1, 1, 0, 0, 0]
         ]
-        gol = GoL(initBoard=board)
+        gol = self.createGoL(board)
         gol.step()
         nextBoard = gol.board
         self.assertTrue(boardIO.checkEquals(nextBoard, nextBoardValidated))
 
+    @unittest.skipUnless(os.path.exists(TEST_DIR + "mediumRulesTest.boardC"), "Fixture mediumRulesTest is missing")
     def testMediumBoard(self):
             board = boardIO.loadCompressedBoard(TEST_DIR + "mediumRulesTest")
             validBoard1 = boardIO.loadCompressedBoard(TEST_DIR + "mediumRulesTestResult1")
             validBoard21 = boardIO.loadCompressedBoard(TEST_DIR + "mediumRulesTestResult21")
 
-            gol = GoL(initBoard=board)
+            gol = self.createGoL(board)
             gol.step()
             nextBoard = gol.board
             self.assertTrue(boardIO.checkEquals(nextBoard, validBoard1))
@@ -153,7 +248,7 @@ class GoLRulesTest(unittest.TestCase):
             [0, 0, 0, 0, 0],
         ]
 
-        gol = GoL(initBoard=board)
+        gol = self.createGoL(board)
         gol.step(2)
         nextBoard = gol.board
 
@@ -168,7 +263,7 @@ class GoLRulesTest(unittest.TestCase):
             [0, 0, 0, 0, 0],
         ]
 
-        gol = GoL(initBoard=board)
+        gol = self.createGoL(board)
         gol.step(2)
         nextBoard = gol.board
 
@@ -188,7 +283,7 @@ class GoLRulesTest(unittest.TestCase):
             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
         ]
 
-        gol = GoL(initBoard=board)
+        gol = self.createGoL(board)
         gol.step(5)
         nextBoard = gol.board
 
@@ -214,12 +309,624 @@ class GoLRulesTest(unittest.TestCase):
             [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
         ]
 
-        gol = GoL(initBoard=board)
+        gol = self.createGoL(board)
         gol.step(100)
         nextBoard = gol.board
 
         self.assertTrue(boardIO.checkEquals(nextBoard, board))
 
 
+class BitPackedRulesTest(GoLRulesTest):
+    engine = BitPackedEngine
+
+    def testWordBoundaries(self):
+        board = boardIO.createRandomBoard(37, 130)
+        expected = GoL(initBoard=board)
+        gol = self.createGoL(board)
+        for _ in range(10):
+            expected.step()
+            gol.step()
+            self.assertTrue(boardIO.checkEquals(gol.board, expected.board))
+
+
+class HashLifeRulesTest(GoLRulesTest):
+    engine = HashLifeEngine
+
+    @unittest.skip("Unbounded universe: the fixture expects dead cells behind the board edge")
+    def testMediumBoard(self):
+        pass
+
+    def testLargeJump(self):
+        board = boardIO.addBorder(boardIO.createRandomBoard(20, 20), 80)
+        expected = GoL(initBoard=board)
+        gol = self.createGoL(board)
+        expected.step(64)
+        gol.step(64)
+        self.assertTrue(boardIO.checkEquals(gol.board, expected.board))
+
+    def testGliderRegion(self):
+        board = gliderBoard(3, 3)
+        gol = self.createGoL(board)
+        gol.step(2 ** 20)
+        offset = 2 ** 18  # Glider moves one cell diagonally every 4 generations
+        self.assertTrue(boardIO.checkEquals(gol.getRegion(offset, offset, offset + 3, offset + 3), board))
+        self.assertEqual(gol.getXY(offset + 1, offset), 1)
+
+        # Editing keeps the universe outside of the board
+        gol.setXY(0, 0, 1)
+        gol.setXY(-3, 2, 1)
+        self.assertEqual(gol.engine.root.n, 7)
+        self.assertEqual((gol.getXY(0, 0), gol.getXY(-3, 2)), (1, 1))
+        gol.setXY(-3, 2, 0)
+        self.assertTrue(boardIO.checkEquals(gol.getRegion(offset, offset, offset + 3, offset + 3), board))
+        self.assertEqual(gol.engine.root.n, 6)
+
+    def testCacheLimit(self):
+        board = boardIO.addBorder(boardIO.createRandomBoard(16, 16), 40)
+        expected = GoL(initBoard=board)
+        expected.step(64)
+        engine = HashLifeEngine(board, cacheSize=1024)
+        for _ in range(8):
+            engine.step(8)
+        self.assertGreater(engine.cacheClears, 0)
+        self.assertTrue(boardIO.checkEquals(engine.getRegion(0, 0, *board.shape), expected.board))
+
+
+class TiledRulesTest(GoLRulesTest):
+    engine = partial(TiledEngine, tileSize=4)
+
+    def testChangeMask(self):
+        board = boardIO.emptyBoard(12, 12)
+        board[1][1] = board[1][2] = board[2][1] = board[2][2] = 1  # Block in tile (0, 0)
+        board[9][5] = board[9][6] = board[9][7] = 1  # Blinker in tile (2, 1)
+        gol = self.createGoL(board)
+        gol.step()
+        changed = [(x, y) for x, y in zip(*gol.engine.changeMask.nonzero())]
+        self.assertEqual(changed, [(2, 1)])
+
+    def testSettlingSoup(self):
+        # Starts with untracked full passes and has to switch back to tile steps once the soup settles
+        board = boardIO.createRandomBoard(40, 40)
+        expected = GoL(initBoard=board)
+        gol = self.createGoL(board)
+        for _ in range(30):
+            expected.step(10)
+            gol.step(10)
+            self.assertTrue(boardIO.checkEquals(gol.board, expected.board))
+
+
+class ParallelRulesTest(GoLRulesTest):
+    engine = partial(ParallelEngine, workers=3)
+
+    def testRandomBoard(self):
+        board = boardIO.createRandomBoard(61, 47)
+        expected = GoL(initBoard=board)
+        gol = self.createGoL(board)
+        expected.step(10)
+        gol.step(10)
+        self.assertTrue(boardIO.checkEquals(gol.board, expected.board))
+
+
+class SparseRulesTest(GoLRulesTest):
+    engine = SparseEngine
+
+    @unittest.skip("Unbounded universe: the fixture expects dead cells behind the board edge")
+    def testMediumBoard(self):
+        pass
+
+    def testGrowsBeyondBoard(self):
+        board = gliderBoard(3, 3)
+        gol = self.createGoL(board)
+        gol.step(400)
+        self.assertEqual(gol.engine.boundingBox(), (100, 100, 103, 103))
+        self.assertTrue(boardIO.checkEquals(gol.getRegion(100, 100, 103, 103), board))
+        self.assertFalse(gol.board.any())
+
+        gol.setXY(-5, 7, 1)
+        self.assertEqual(gol.getXY(-5, 7), 1)
+        self.assertEqual(gol.engine.livingCells, 6)
+
+    def testWorldCoordinatesBeforeStep(self):
+        gol = self.createGoL(boardIO.emptyBoard(5, 5))
+        gol.setXY(-1, 2, 1)
+        self.assertEqual(gol.getXY(-1, 2), 1)
+        self.assertEqual(gol.getXY(4, 2), 0)
+        self.assertTrue(boardIO.checkEquals(gol.getRegion(-1, 2, 0, 3), [[1]]))
+        self.assertFalse(gol.board.any())
+
+    def testNeighbourRegion(self):
+        board = boardIO.createRandomBoard(12, 10)
+        gol = self.createGoL(board)
+        gol.step(6)
+        expected = GoL(boardIO.addBorder(board, 20))
+        expected.step(6)
+        self.assertTrue(boardIO.checkEquals(gol.getNeighbourRegion(-5, -4, 15, 14),
+                                            expected.getNeighbourRegion(15, 16, 35, 34)))
+
+    def testFromCoordinates(self):
+        board = boardIO.addBorder(boardIO.createRandomBoard(20, 20), 40)
+        expected = GoL(initBoard=board)
+        expected.step(30)
+        xs, ys = board.nonzero()
+        engine = SparseEngine.fromCoordinates(xs, ys, *board.shape)
+        engine.step(30)
+        self.assertTrue(boardIO.checkEquals(engine.toBoard(), expected.board))
+
+
+class ExpandingRulesTest(GoLRulesTest):
+    engine = partial(ExpandingEngine, growChunk=4)
+
+    @unittest.skip("Unbounded universe: the fixture expects dead cells behind the board edge")
+    def testMediumBoard(self):
+        pass
+
+    def testMatchesSparseEngine(self):
+        board = boardIO.createRandomBoard(30, 25)
+        gol = self.createGoL(board)
+        sparse = SparseEngine(board)
+        for n in [1, 7, 50]:
+            gol.step(n)
+            sparse.step(n)
+            box = sparse.boundingBox()
+            self.assertEqual(gol.engine.boundingBox(), box)
+            self.assertTrue(boardIO.checkEquals(gol.getRegion(*box), sparse.getRegion(*box)))
+
+    def testGrowsInChunks(self):
+        board = boardIO.emptyBoard(10, 10)
+        board[:] = 1
+        gol = self.createGoL(board)
+        gol.step()
+        self.assertEqual(gol.engine.shape, (4 + 10 + 4, 4 + 10 + 4))
+
+        # Only the reached side gets growChunk more cells, the others are trimmed to at most growChunk
+        board = boardIO.emptyBoard(20, 20)
+        board[0, 5:8] = 1
+        gol = self.createGoL(board)
+        gol.step()
+        self.assertEqual(gol.engine.shape, (4 + 1 + 4, 4 + 3 + 4))
+        self.assertEqual((gol.engine.originX, gol.engine.originY), (-4, 1))
+
+    def testFollowsGlider(self):
+        board = gliderBoard(3, 3)
+        gol = self.createGoL(board)
+        gol.step(4000)
+        self.assertEqual(gol.engine.boundingBox(), (1000, 1000, 1003, 1003))
+        self.assertTrue(boardIO.checkEquals(gol.getRegion(1000, 1000, 1003, 1003), board))
+        self.assertLess(max(gol.engine.shape), 20)
+        self.assertGreater(gol.engine.originX, 900)
+
+        gol.setXY(-5, 7, 1)
+        self.assertEqual(gol.getXY(-5, 7), 1)
+        self.assertEqual(gol.engine.boundingBox(), (-5, 7, 1003, 1003))
+
+
+class BoundaryTest(unittest.TestCase):
+    def testTorusGlider(self):
+        board = gliderBoard(8, 6)
+        gol = GoL(board, boundary=BOUNDARY_TORUS)
+        gol.step(4 * 24)  # The glider moves (24, 24), which is (0, 0) on a 8x6 torus
+        self.assertTrue(boardIO.checkEquals(gol.board, board))
+
+    def testConsistentWithCountNeighbours(self):
+        for boundary in (BOUNDARY_DEAD, BOUNDARY_ALIVE, BOUNDARY_TORUS):
+            gol = GoL(boardIO.createRandomBoard(9, 7), boundary=boundary)
+            for _ in range(3):
+                board = gol.board.copy()
+                expected = [[gol.countNeighbours(x, y) - board[x][y] == 3 or
+                             (board[x][y] and gol.countNeighbours(x, y) - board[x][y] == 2)
+                             for y in range(gol.height)] for x in range(gol.width)]
+                gol.step()
+                self.assertTrue(boardIO.checkEquals(gol.board, expected))
+
+    def testNeighbourCountsArray(self):
+        for boundary in (BOUNDARY_DEAD, BOUNDARY_ALIVE, BOUNDARY_TORUS):
+            gol = GoL(boardIO.createRandomBoard(9, 7), boundary=boundary)
+            gol.step()
+            counts = gol.neighbourCounts()
+            for x in range(gol.width):
+                for y in range(gol.height):
+                    self.assertEqual(counts[x, y], gol.countNeighbours(x, y) - gol.getXY(x, y))
+            self.assertIs(gol.neighbourCounts(), counts)
+            gol.setXY(0, 0, 1 - gol.getXY(0, 0))
+            self.assertIsNot(gol.neighbourCounts(), counts)
+
+    def testCountEdge(self):
+        self.assertEqual(GoL(boardIO.emptyBoard(3, 3), countEdge=True).boundary, BOUNDARY_ALIVE)
+        self.assertRaises(ValueError, lambda: GoL(boardIO.emptyBoard(3, 3), boundary="mirror"))
+
+    def testEngineBoundary(self):
+        self.assertRaises(ValueError, lambda: GoL(boardIO.emptyBoard(3, 3), engine=BitPackedEngine,
+                                                  boundary=BOUNDARY_TORUS))
+        self.assertRaises(ValueError, lambda: GoL(boardIO.emptyBoard(3, 3), engine=BitPackedEngine, countEdge=True))
+        self.assertEqual(GoL(boardIO.emptyBoard(3, 3), engine=BitPackedEngine).boundary, BOUNDARY_DEAD)
+
+
+class HistoryTest(unittest.TestCase):
+    def simulate(self, board, generations, **kwargs):
+        gol = GoL(board, **kwargs)
+        boards = [gol.board.copy()]
+        for _ in range(generations):
+            gol.step()
+            boards.append(gol.board.copy())
+        return boards
+
+    def testSeek(self):
+        board = boardIO.createRandomBoard(31, 19)
+        expected = self.simulate(board, 80)
+        for engine in (None, BitPackedEngine):
+            gol = GoL(board, engine=engine, historyBudget=2 ** 20)
+            gol.step(80)
+            for generation in [0, 79, 40, 3, 33, 32, 31, 80]:
+                gol.seek(generation)
+                self.assertEqual(gol.generation, generation)
+                self.assertTrue(boardIO.checkEquals(gol.board, expected[generation]))
+
+            # Steps after seek are replayed
+            gol.seek(10)
+            gol.step(5)
+            self.assertTrue(boardIO.checkEquals(gol.board, expected[15]))
+            self.assertEqual(gol.history.end, 81)
+
+    def testEditDiscardsLaterGenerations(self):
+        board = boardIO.createRandomBoard(16, 12)
+        gol = GoL(board, historyBudget=2 ** 20)
+        gol.step(20)
+        gol.seek(5)
+        gol.setXY(3, 3, 1 - gol.getXY(3, 3))
+        edited = gol.board.copy()
+        gol.step(2)
+        self.assertEqual(gol.history.end, 8)
+        self.assertTrue(boardIO.checkEquals(gol.board, self.simulate(edited, 2)[2]))
+        gol.seek(5)
+        self.assertTrue(boardIO.checkEquals(gol.board, edited))
+        self.assertRaises(IndexError, lambda: gol.seek(9))
+
+    def testReset(self):
+        board = boardIO.createRandomBoard(16, 12)
+        for historyBudget in (0, 2 ** 20):
+            gol = GoL(board, historyBudget=historyBudget)
+            gol.setXY(0, 0, 1 - gol.getXY(0, 0))
+            edited = gol.board.copy()
+            gol.step(10)
+            gol.reset()
+            initial = edited if historyBudget else board  # The history keeps edits of generation 0
+            self.assertEqual(gol.generation, 0)
+            self.assertTrue(boardIO.checkEquals(gol.board, initial))
+            gol.step(10)
+            self.assertTrue(boardIO.checkEquals(gol.board, self.simulate(initial, 10)[10]))
+
+    def testBudget(self):
+        board = boardIO.createRandomBoard(64, 64)
+        expected = self.simulate(board, 200)
+        gol = GoL(board, historyBudget=4000)
+        gol.step(200)
+        history = gol.history
+        self.assertGreater(history.start, 0)
+        self.assertEqual(history.start % history.keyframeInterval, 0)
+        self.assertEqual(history.end, 201)
+        gol.seek(history.start)
+        self.assertTrue(boardIO.checkEquals(gol.board, expected[history.start]))
+        self.assertRaises(IndexError, lambda: gol.seek(history.start - 1))
+        self.assertRaises(ValueError, lambda: GoL(board).seek(0))
+
+    def testSparseDeltas(self):
+        history = GoLHistory((100, 100), keyframeInterval=4)
+        board = boardIO.emptyBoard(100, 100)
+        for generation in range(6):
+            board[generation, generation] = 1
+            history.record(generation, board)
+        self.assertLess(history.nbytes, 3 * 100 * 100 // 8)
+        board[:6, :6] = 0
+        board[2, 2] = board[0, 0] = board[1, 1] = 1
+        self.assertTrue(boardIO.checkEquals(history.board(2), board))
+
+
+class GoLBatchTest(unittest.TestCase):
+    def testMatchesSingleBoards(self):
+        boards = [boardIO.createRandomBoard(10, 12) for _ in range(8)]
+        batch = GoLBatch(boards)
+        batch.step(15)
+        for i, board in enumerate(boards):
+            gol = GoL(initBoard=board)
+            gol.step(15)
+            self.assertTrue(boardIO.checkEquals(batch[i], gol.board))
+
+    def testAbortReplaceDrop(self):
+        blinker = boardIO.emptyBoard(5, 5)
+        blinker[2][1] = blinker[2][2] = blinker[2][3] = 1
+        soup = boardIO.createRandomBoard(5, 5)
+        batch = GoLBatch([blinker, soup])
+        batch.step(3, abortCondition=GoLBatch.stagnated)
+        self.assertFalse(batch.active[0])
+        self.assertEqual(batch.generations[0], 2)
+
+        batch.replace(0, blinker)
+        self.assertTrue(batch.active[0])
+        self.assertEqual(batch.generations[0], 0)
+
+        batch.drop([False, True])
+        self.assertEqual(len(batch), 1)
+        self.assertTrue(boardIO.checkEquals(batch[0], blinker))
+
+
+class RenderTest(unittest.TestCase):
+    def assertRenderersEqual(self, gol, settings):
+        img = renderImage(gol, settings)
+        self.assertTrue(boardIO.checkEquals(img, renderImageCellwise(gol, settings)))
+
+    def testIntegerZoom(self):
+        gol = GoL(boardIO.createRandomBoard(30, 20))
+        for size, topLeft, bottomRight in [((300, 200), (0, 0), (-1, -1)),
+                                           ((256, 256), (3, 2), (18, 17)),
+                                           ((97, 45), (5, 5), (-1, -1))]:
+            settings = RenderSettings(*size)
+            settings.topLeft = topLeft
+            settings.bottomRight = bottomRight
+            settings.colormap = cm.COLORMAP_WHITE_GREEN
+            self.assertRenderersEqual(gol, settings)
+            settings.showGridlines = True
+            self.assertRenderersEqual(gol, settings)
+
+    def testNeighbourCounts(self):
+        # renderImageCellwise can only draw counts if the cells around the board are dead, and prints floats as such
+        gol = GoL(boardIO.addBorder(boardIO.createRandomBoard(20, 16), 2).astype(int))
+        for size, topLeft, bottomRight in [((300, 240), (0, 0), (-1, -1)),
+                                           ((301, 203), (0.6, 1.3), (21.2, 17.7)),
+                                           ((512, 512), (7, 5), (16, 14)),  # Big cells, drawn glyph by glyph
+                                           ((601, 437), (3.4, 0.7), (12.3, 8.2))]:
+            settings = RenderSettings(*size)
+            settings.topLeft = topLeft
+            settings.bottomRight = bottomRight
+            settings.showNeighbours = True
+            settings.offColorIndex = 60
+            self.assertRenderersEqual(gol, settings)
+            settings.showGridlines = True
+            self.assertRenderersEqual(gol, settings)
+
+    def testAnimatedViewport(self):
+        gol = GoL(boardIO.createRandomBoard(25, 25))
+        settings = RenderSettings(200, 200)
+        settings.showGridlines = True
+        settings.onColorIndex = 200.5
+        settings.offColorIndex = 20.3
+        for i in range(10):
+            settings.topLeft = (2 + i * 0.3, 3 - i * 0.1)
+            settings.bottomRight = (-4 - i * 0.2, -3 + i * 0.15)
+            self.assertRenderersEqual(gol, settings)
+
+    def testIncrementalRenderer(self):
+        gol = GoL(boardIO.createRandomBoard(30, 20))
+        settings = RenderSettings(150, 100)
+        settings.showGridlines = True
+        settings.colormap = cm.COLORMAP_WHITE_GREEN
+        renderer = IncrementalRenderer()
+        for i in range(12):
+            if i == 5:
+                settings.topLeft = (2, 1)
+            if i == 8:
+                settings.colormap = cm.COLORMAP_BLACK_WHITE
+            self.assertTrue(boardIO.checkEquals(renderer(gol, settings), renderImage(gol, settings)))
+            gol.step()
+
+    def testRenderMappedBoard(self):
+        board = boardIO.createRandomBoard(30, 20)
+        mapped = boardIO.saveMappedBoard(board, TEST_DIR + "render.boardM")
+        settings = RenderSettings(90, 60)
+        settings.topLeft = (2, 3)
+        settings.showGridlines = True
+        self.assertTrue(boardIO.checkEquals(renderImage(mapped, settings), renderImage(GoL(board), settings)))
+        settings.bottomRight = (20, 15)
+        self.assertTrue(boardIO.checkEquals(fastImage(mapped, settings), fastImage(GoL(board), settings)))
+        settings.showNeighbours = True
+        self.assertTrue(boardIO.checkEquals(renderImage(mapped, settings), renderImage(GoL(board), settings)))
+
+    def testViewportMappingCached(self):
+        mapping = viewportMapping((1, 2), (-1, -1), 100, 80, 30, 20)
+        self.assertIs(mapping, viewportMapping((1, 2), (-1, -1), 100, 80, 30, 20))
+        self.assertIsNot(mapping, viewportMapping((1, 2), (-1, -1), 100, 80, 31, 20))
+
+
+class FrameCollector:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, img):
+        self.frames.append(img)
+
+    def release(self):
+        pass
+
+
+class VideoRendererTest(unittest.TestCase):
+    def renderFrames(self, board, renderWorkers=0, frameWorkers=0, renderer=None, engine=None, colormap=None,
+                     **kwargs):
+        random.seed(42)
+        if colormap is None:
+            colormaps = itertools.cycle([cm.COLORMAP_WHITE_GREEN, cm.COLORMAP_BLACK_WHITE,
+                                         cm.COLORMAP_BLACK_PASTELLGREEN])
+            colormap = lambda: next(colormaps)
+        vid = GoLVideoRenderer(TEST_DIR + "video.avi", 64, 48, fpg=3, renderWorkers=renderWorkers,
+                               frameWorkers=frameWorkers, colormap=colormap, renderer=renderer)
+        vid.vidOut = FrameCollector()
+        vid.appendGoL(GoL(board, engine=engine), **kwargs)
+        frames = vid.vidOut.frames
+        vid.finish()
+        return frames
+
+    def assertFramesEqual(self, frames1, frames2):
+        self.assertEqual(len(frames1), len(frames2))
+        for img1, img2 in zip(frames1, frames2):
+            self.assertTrue(boardIO.checkEquals(img1, img2))
+
+    def testPipelinedMatchesSequential(self):
+        board = boardIO.createRandomBoard(16, 12)
+        kwargs = dict(maxGenerations=20, tl=((0, 0), (2, 2)), br=((-1, -1), (-3, -3)), onColorChange=20,
+                      abortCondition=AbortDifHandler(board))
+        sequential = self.renderFrames(board, **kwargs)
+        kwargs["abortCondition"] = AbortDifHandler(board)
+        pipelined = self.renderFrames(board, renderWorkers=3, **kwargs)
+        self.assertFramesEqual(sequential, pipelined)
+
+    def testStatefulRenderer(self):
+        board = boardIO.createRandomBoard(200, 200)
+        kwargs = dict(maxGenerations=60, colormap=cm.COLORMAP_WHITE_GREEN)
+        sequential = self.renderFrames(board, renderer=IncrementalRenderer(1), **kwargs)
+        self.assertFramesEqual(sequential, self.renderFrames(board, renderWorkers=4, renderer=IncrementalRenderer(1),
+                                                             **kwargs))
+        self.assertFramesEqual(sequential, self.renderFrames(board, frameWorkers=2, renderer=IncrementalRenderer(1),
+                                                             **kwargs))
+
+    def testUnboundedEngine(self):
+        board = gliderBoard(8, 8)
+        kwargs = dict(maxGenerations=40, tl=(-10, -10), br=(13, 13), engine=SparseEngine)
+        sequential = self.renderFrames(board, **kwargs)
+        self.assertFramesEqual(sequential, self.renderFrames(board, renderWorkers=2, **kwargs))
+        self.assertFramesEqual(sequential, self.renderFrames(board, frameWorkers=2, **kwargs))
+
+    def testNullVideoWriter(self):
+        vid = GoLVideoRenderer(TEST_DIR + "null.avi", 64, 48, fpg=2, colormap=cm.COLORMAP_WHITE_GREEN,
+                               videoWriter=NullVideoWriter)
+        vid.appendGoL(GoL(boardIO.createRandomBoard(16, 12)), maxGenerations=4)
+        self.assertEqual(vid.vidOut.nFrames, 10)
+        self.assertEqual(vid.vidOut.nBytes, 10 * 64 * 48 * 3)
+
+    def testPipeVideoWriter(self):
+        filename = TEST_DIR + "pipe.raw"
+        copyStdin = [sys.executable, "-c",
+                     "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open(sys.argv[1], 'wb'))", filename]
+        vid = GoLVideoRenderer(filename, 64, 48, videoWriter=partial(PipeVideoWriter, command=copyStdin, bufferSize=2))
+        vid.renderSettings.colormap = None  # Gray frames are converted to BGR
+        vid.appendGoL(GoL(boardIO.createRandomBoard(16, 12)), maxGenerations=9)
+        vid.finish()
+        self.assertEqual(os.path.getsize(filename), 10 * 64 * 48 * 3)
+
+    def testFrameWorkersMatchSequential(self):
+        board = boardIO.createRandomBoard(16, 12)
+        kwargs = dict(maxGenerations=5, tl=((0, 0), (2, 3)), br=((-1, -1), (-4, -3)))
+        self.assertFramesEqual(self.renderFrames(board, **kwargs), self.renderFrames(board, frameWorkers=2, **kwargs))
+
+    def testFrameCache(self):
+        board = boardIO.emptyBoard(8, 6)
+        board[3, 1:4] = 1
+        for workers in (dict(), dict(renderWorkers=2), dict(frameWorkers=2)):
+            frames = []
+            for frameCacheSize in (0, 4):
+                vid = GoLVideoRenderer(TEST_DIR + "video.avi", 64, 48, fpg=2, colormap=cm.COLORMAP_WHITE_GREEN,
+                                       frameCacheSize=frameCacheSize, **workers)
+                vid.vidOut = FrameCollector()
+                vid.appendGoL(GoL(board), maxGenerations=6)
+                vid.finish()
+                frames.append(vid.vidOut.frames)
+            self.assertFramesEqual(*frames)
+            self.assertEqual(vid.reusedFrames, 14 - 2)  # Only the two phases of the blinker are rendered
+
+
+class CycleDetectorTest(unittest.TestCase):
+    def runUntilAbort(self, gol, detector, maxGenerations=500):
+        # Called after every step, as in GoLVideoRenderer.appendGoL
+        gol.step()
+        while not detector(gol) and gol.generation < maxGenerations:
+            gol.step()
+
+    def testBlinker(self):
+        board = boardIO.emptyBoard(5, 5)
+        board[2, 1:4] = 1
+        gol, detector = GoL(board), CycleDetector(board)
+        self.runUntilAbort(gol, detector)
+        self.assertEqual((detector.period, detector.transient, gol.generation), (2, 0, 2))
+
+    def testTransient(self):
+        board = boardIO.emptyBoard(6, 6)
+        for x, y in [(2, 2), (3, 2), (2, 3)]:
+            board[x, y] = 1
+        gol, detector = GoL(board), CycleDetector(board)
+        self.runUntilAbort(gol, detector)
+        self.assertEqual((detector.period, detector.transient, gol.generation), (1, 1, 2))
+
+    def testExtendGenerations(self):
+        board = boardIO.emptyBoard(5, 5)
+        board[2, 1:4] = 1
+        gol, detector = GoL(board), CycleDetector(board, extendGenerations=7)
+        self.runUntilAbort(gol, detector)
+        self.assertEqual((detector.detectedAt, gol.generation), (2, 9))
+
+    def testTorusGlider(self):
+        board = gliderBoard(8, 6)
+        gol, detector = GoL(board, boundary=BOUNDARY_TORUS), CycleDetector(board)
+        self.runUntilAbort(gol, detector)
+        self.assertEqual(detector.period, 96)
+
+        # Periods longer than maxPeriod are not detected
+        gol, detector = GoL(board, boundary=BOUNDARY_TORUS), CycleDetector(board, maxPeriod=50)
+        self.runUntilAbort(gol, detector, maxGenerations=200)
+        self.assertIsNone(detector.period)
+
+    def testHashBoard(self):
+        board = boardIO.createRandomBoard(13, 7)
+        self.assertEqual(boardIO.hashBoard(board), boardIO.hashBoard(board.astype(bool)))
+        self.assertNotEqual(boardIO.hashBoard(board), boardIO.hashBoard(board.reshape(7, 13)))
+
+
+class TimelineTest(unittest.TestCase):
+    def testSeekAndStream(self):
+        board = boardIO.createRandomBoard(23, 17)
+        timeline = GenerationTimeline.record(GoL(board), 40, TEST_DIR + "random.golT", keyframeInterval=8)
+        self.assertEqual(len(timeline), 41)
+
+        gol = GoL(board)
+        expected = []
+        for _ in range(41):
+            expected.append(gol.board.copy())
+            gol.step()
+        for generation in [40, 3, 17, 16, 0, 39, 25, 26, 27]:
+            self.assertTrue(boardIO.checkEquals(timeline.board(generation), expected[generation]))
+        for streamed, board in zip(timeline.boards(5), expected[5:]):
+            self.assertTrue(boardIO.checkEquals(streamed, board))
+
+        # A reopened timeline can be extended, an incomplete last record is dropped
+        timeline.close()
+        with open(TEST_DIR + "random.golT", "ab") as d:
+            d.write(b"\x00\x10")
+        timeline = GenerationTimeline(TEST_DIR + "random.golT", mode="r+")
+        self.assertEqual(len(timeline), 41)
+        timeline.append(gol.board)
+        self.assertTrue(boardIO.checkEquals(timeline.board(41), gol.board))
+        timeline.close()
+
+    def testPlaybackWindow(self):
+        board = gliderBoard(6, 6)
+        window = (-5, -5, 20, 20)
+        rmtree(TEST_DIR + "timelines", ignore_errors=True)
+        timeline = loadTimeline(GoL(board, engine=SparseEngine), 30, window=window, folder=TEST_DIR + "timelines")
+
+        gol = GoL(board, engine=SparseEngine)
+        playback = timeline.toGoL(3)
+        gol.step(3)
+        for _ in range(10):
+            self.assertTrue(boardIO.checkEquals(playback.getRegion(*window), gol.getRegion(*window)))
+            self.assertTrue(boardIO.checkEquals(playback.board, gol.board))
+            gol.step()
+            playback.step()
+        self.assertEqual(playback.generation, 13)
+
+        # Edits are overwritten by the next recorded generation
+        playback.setXY(0, 0, 1)
+        playback.step()
+        gol.step()
+        self.assertEqual(playback.generation, 14)
+        self.assertTrue(boardIO.checkEquals(playback.getRegion(*window), gol.getRegion(*window)))
+
+        playback = timeline.toGoL(30)
+        self.assertRaises(IndexError, playback.step)
+        self.assertEqual(playback.generation, 30)
+        self.assertEqual(playback.engine.generation, 30)
+
+        # The stored timeline is reused without simulating
+        gol = GoL(board, engine=SparseEngine)
+        self.assertEqual(loadTimeline(gol, 20, window=window, folder=TEST_DIR + "timelines").filename,
+                         timeline.filename)
+        self.assertEqual(gol.generation, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import re
 from pathlib import Path
@@ -6,8 +7,6 @@ import cv2
 import numpy as np
 
 # Default chars used when saving boards
-from tqdm import tqdm
-
 CHAR_ON = "X"
 CHAR_OFF = "_"
 CHAR_DELIMITER = "\n"
@@ -18,6 +17,11 @@ CHAR_DELIMITER = "\n"
 # 3 => Maxsize = 256^3 - 1 = 16_777_215 is maxWidth/maxHeight
 COMPRESSED_DIM_LEN = 3
 
+# Dtype of all boards (1 byte per cell). Loaders and generators return it, other inputs are converted by asBoard
+BOARD_DTYPE = bool
+# Rows of random numbers that are generated at once by createRandomBoard
+RANDOM_ROWS_PER_CHUNK = 1024
+
 
 # ===== from File =====
 # === Normal ===
@@ -54,32 +58,25 @@ def loadBoard(filename):
                 board[x][y] = 0
             else:
                 raise ValueError(f"Invalid char at ({x},{y}): {data[x][y]}")
-    return board
+    return np.array(board, dtype=BOARD_DTYPE)
 
 
 # === Compressed ===
-# Compression shrinks size to ~12%, but increases load time for big files
+# One bit per cell (row by row, most significant bit first), shrinks size to ~12%
 def saveCompressedBoard(board, filename):
-    singleBinString = "".join("".join("1"
-                                      if board[x][y]
-                                      else "0"
-                                      for x in range(len(board)))
-                              for y in range(len(board[0])))
-
-    singleBinString += (8 - len(singleBinString) % 8) * "0"
-    s = ""
-    for i in range(len(singleBinString) // 8):
-        s += chr(int(singleBinString[i * 8:(i + 1) * 8], 2))
+    board = np.asarray(board) != 0
+    width, height = board.shape
+    data = np.packbits(board.T.ravel())
+    if (width * height) % 8 == 0:
+        data = np.append(data, np.uint8(0))  # Files always end with (at least one bit of) padding
 
     if "." not in filename:
         filename += ".boardC"
     os.makedirs(Path(filename).parent, exist_ok=True)
     with open(filename, "wb") as d:
-        w = len(board).to_bytes(byteorder="big", length=COMPRESSED_DIM_LEN)
-        h = len(board[0]).to_bytes(byteorder="big", length=COMPRESSED_DIM_LEN)
-        d.write(w)
-        d.write(h)
-        d.write(s.encode("latin"))
+        d.write(width.to_bytes(byteorder="big", length=COMPRESSED_DIM_LEN))
+        d.write(height.to_bytes(byteorder="big", length=COMPRESSED_DIM_LEN))
+        d.write(data.tobytes())
 
 
 def loadCompressedBoard(filename):
@@ -88,24 +85,117 @@ def loadCompressedBoard(filename):
     with open(filename, "rb") as d:
         widthBin = d.read(COMPRESSED_DIM_LEN)
         heightBin = d.read(COMPRESSED_DIM_LEN)
-        data = d.read()
+        data = np.frombuffer(d.read(), dtype="B")
 
     width = int.from_bytes(widthBin, byteorder="big", signed=False)
     height = int.from_bytes(heightBin, byteorder="big", signed=False)
 
-    board = [[0 for _ in range(height)] for _ in range(width)]
-    pos = 0
-    maxPos = (width * height)
-    for b in data.decode(encoding="latin"):
-        decompressed = f"{ord(b):08b}"
-        for val in decompressed:
-            if pos >= maxPos:
-                break
-            x = pos % width
-            y = pos // width
-            board[x][y] = int(val)
-            pos += 1
-    return board
+    bits = np.zeros(width * height, dtype=BOARD_DTYPE)
+    unpacked = np.unpackbits(data, count=min(width * height, len(data) * 8))
+    bits[:len(unpacked)] = unpacked
+    return np.ascontiguousarray(bits.reshape((height, width)).T)
+
+
+# === Memory mapped ===
+# Fixed header followed by one bit per cell. Every x-row (board[x, :]) starts at a byte boundary, so any region can be
+# read from the mapped file without loading the rest of the board.
+MAPPED_MAGIC = b"GOLBOARD"
+MAPPED_VERSION = 1
+MAPPED_HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("reserved", "<u4"),
+                          ("width", "<u8"), ("height", "<u8")])
+MAPPED_ROWS_PER_CHUNK = 4096
+
+
+class MappedBoard:
+    """
+    Lazily loaded .boardM board. Provides width, height, getXY and getRegion, so it can be rendered directly with
+    imageRenderer.renderImage without materializing the whole board.
+    """
+
+    def __init__(self, filename, mode="r"):
+        self.filename = filename
+        header = np.fromfile(filename, dtype=MAPPED_HEADER, count=1)
+        if len(header) == 0 or header["magic"][0] != MAPPED_MAGIC:
+            raise ValueError(f"{filename} is not a mapped board")
+        if header["version"][0] != MAPPED_VERSION:
+            raise ValueError(f"Unsupported mapped board version: {header['version'][0]}")
+        self.width = int(header["width"][0])
+        self.height = int(header["height"][0])
+        self.name = f"{self.width}x{self.height}"
+        self.rowBytes = -(-self.height // 8)
+        self.data = np.memmap(filename, dtype="B", mode=mode, offset=MAPPED_HEADER.itemsize,
+                              shape=(self.width, self.rowBytes))
+
+    @property
+    def shape(self):
+        return self.width, self.height
+
+    @staticmethod
+    def create(filename, width, height):
+        """Creates an empty (dead) mapped board of the given size on disk and opens it writable."""
+        os.makedirs(Path(filename).parent, exist_ok=True)
+        header = np.array([(MAPPED_MAGIC, MAPPED_VERSION, 0, width, height)], dtype=MAPPED_HEADER)
+        with open(filename, "wb") as d:
+            d.write(header.tobytes())
+            d.truncate(MAPPED_HEADER.itemsize + width * -(-height // 8))
+        return MappedBoard(filename, mode="r+")
+
+    def getXY(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError
+        return (self.data[x, y // 8] >> (7 - y % 8)) & 1
+
+    def getRegion(self, xMin, yMin, xMax, yMax):
+        """Cells with xMin <= x < xMax and yMin <= y < yMax. Cells outside of the board are dead."""
+        region = np.zeros((max(0, xMax - xMin), max(0, yMax - yMin)), dtype=BOARD_DTYPE)
+        x0, y0, x1, y1 = regionOverlap(self.shape, xMin, yMin, xMax, yMax)
+        if x0 < x1 and y0 < y1:
+            firstByte = y0 // 8
+            rows = np.unpackbits(self.data[x0:x1, firstByte:-(-y1 // 8)], axis=1)
+            region[x0 - xMin:x1 - xMin, y0 - yMin:y1 - yMin] = rows[:, y0 - firstByte * 8:y1 - firstByte * 8]
+        return region
+
+    def setRegion(self, x, y, region):
+        """Writes region with its top left cell at (x, y). Rows are read-modify-written as whole bytes."""
+        region = np.asarray(region) != 0
+        x1, y1 = x + region.shape[0], y + region.shape[1]
+        firstByte, lastByte = y // 8, -(-y1 // 8)
+        rows = np.unpackbits(self.data[x:x1, firstByte:lastByte], axis=1)
+        rows[:, y - firstByte * 8:y1 - firstByte * 8] = region
+        self.data[x:x1, firstByte:lastByte] = np.packbits(rows, axis=1)
+
+    def getNeighbourRegion(self, xMin, yMin, xMax, yMax):
+        return regionNeighbours(self, xMin, yMin, xMax, yMax)
+
+    def __array__(self, dtype=None, copy=None):
+        board = self.getRegion(0, 0, self.width, self.height)
+        return board if dtype is None else board.astype(dtype)
+
+    def flush(self):
+        self.data.flush()
+
+
+def saveMappedBoard(board, filename):
+    if not isinstance(board, MappedBoard):
+        board = np.asarray(board)
+    width, height = board.shape
+
+    if "." not in filename:
+        filename += ".boardM"
+    mapped = MappedBoard.create(filename, width, height)
+    for x in range(0, width, MAPPED_ROWS_PER_CHUNK):
+        x1 = min(x + MAPPED_ROWS_PER_CHUNK, width)
+        if isinstance(board, MappedBoard):
+            rows = board.getRegion(x, 0, x1, height)
+        else:
+            rows = board[x:x1]
+        mapped.data[x:x1] = np.packbits(rows != 0, axis=1)
+    mapped.flush()
+    return mapped
+
+
+def loadMappedBoard(filename):
+    return MappedBoard(_checkFileExists(filename, ".boardM"))
 
 
 # === RLE ===
@@ -115,53 +205,149 @@ def loadCompressedBoard(filename):
 # This encoding was introduced by Dave Buckingham and is now the usual means of exchanging relatively
 # small patterns by email or in online forum discussions.
 # The "run lengths" are the numbers, b's are dead cells, o's are live cells, and dollar signs signal new lines:
-def saveRLE(board, filename):
-    pass
+RLE_LINE_LENGTH = 70
+RLE_RULE = "B3/S23"
+_RLE_HEADER = re.compile(r"x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)")
+# Characters of RLE data that are tokenized at once, bounds the temporary int64 arrays of loadRLE
+RLE_CHUNK_SIZE = 2 ** 20
+
+
+def saveRLE(board, filename, rule=RLE_RULE):
+    board = np.asarray(board) != 0
+    width, height = board.shape
+
+    # Runs of living cells, row by row (y), found by comparing every cell to its left/right neighbour
+    rows = np.pad(board.T, ((0, 0), (1, 1)))
+    runStartsY, runStartsX = np.nonzero(rows[:, 1:-1] & ~rows[:, :-2])
+    _, runEndsX = np.nonzero(rows[:, 1:-1] & ~rows[:, 2:])
+    runLengths = runEndsX - runStartsX + 1
+
+    # Dead cells in front of every run: up to the end of the previous run in the same row, else from x = 0
+    previousEndsX = np.concatenate(([-1], runEndsX[:-1]))
+    newRow = np.concatenate(([True], runStartsY[1:] != runStartsY[:-1]))
+    gaps = np.where(newRow, runStartsX, runStartsX - previousEndsX - 1)
+    rowSkips = np.diff(runStartsY, prepend=0)
+
+    def run(n, tag):
+        return f"{n}{tag}" if n > 1 else tag
+
+    tokens = []
+    for skip, gap, length in zip(rowSkips.tolist(), gaps.tolist(), runLengths.tolist()):
+        if skip:
+            tokens.append(run(skip, "$"))
+        if gap:
+            tokens.append(run(gap, "b"))
+        tokens.append(run(length, "o"))
+    tokens.append("!")
+
+    lines = [f"x = {width}, y = {height}, rule = {rule}"]
+    line = ""
+    for token in tokens:
+        if len(line) + len(token) > RLE_LINE_LENGTH:
+            lines.append(line)
+            line = ""
+        line += token
+    lines.append(line)
+
+    if "." not in filename:
+        filename += ".rle"
+    os.makedirs(Path(filename).parent, exist_ok=True)
+    with open(filename, "w") as d:
+        d.write("\n".join(lines) + "\n")
 
 
-def loadRLE(filename):
+def _loadRLERuns(filename):
+    """
+    Returns the runs of living cells (xs, ys, lengths) of an RLE file and the board size (width, height), which is
+    the size from the header or the extent of the data, whatever is bigger. The data is tokenized in chunks of
+    whole lines, so the temporary arrays do not grow with the file.
+    """
     filename = _checkFileExists(filename, ".rle")
     with open(filename, "r") as d:
-        line = "#"
+        line = d.readline()
         while line.startswith("#"):
-            line = d.readline()   # Reads one more line than needed. This line contains position and rules
-        data = d.read()
-
-    data = data.replace("\n", "")  # Linebreaks are irrelevant
-    data = data.split("!")[0]  # End of file
-    lines = data.split("$")
-    del data
-    countings = [map(lambda s: int(s) if s != "" else 1, re.split("[ob]", line)) for line in lines]
-    w = max([sum(row) for row in countings])
-    h = len(countings)
-    del countings
-
-    print("Width:", w, "Height:", h)
-    board = emptyBoard(w, h)
-    alreadyParsedLines = dict()
-    for i, line in tqdm(enumerate(lines),desc="Loading RLE", total=h):
-        if line in alreadyParsedLines:
-            board[:, i] = alreadyParsedLines[line]
-            # print("Used Cache (",i,")")
-            continue
-
-        # if not i % 5000:
-        #     print(f"RLE Loading line: {i}/{h} ({i / h * 100:.2f}%)")
-        parsedRow = np.array([0 for _ in range(w)])
-        curN = ""
-        sumRow = 0
-        for c in line:
-            if c == "o" or c == "b":
-                n = int(curN) if curN != "" else 1
-                if c == "o":
-                    parsedRow[sumRow:sumRow + n] = 1
-                sumRow += n
-                curN = ""
-                continue
-            curN += c
-        alreadyParsedLines[line] = parsedRow
-        board[:, i] = parsedRow
-    return board
+            line = d.readline()
+        header = _RLE_HEADER.match(line.strip())
+        data = d.read() if header is not None else line + d.read()  # Header is optional
+    data = re.sub(r"\s", "", data).split("!")[0].encode("ascii")
+
+    runs = []
+    width = height = y = start = 0
+    while start < len(data):
+        end = data.find(b"$", start + RLE_CHUNK_SIZE) + 1 or len(data)
+        (runX, runY, runLength), chunkWidth, lastY, newlines = _parseRLEChunk(data[start:end])
+        runs.append((runX, runY + y, runLength))
+        width = max(width, chunkWidth)
+        if lastY >= 0:
+            height = y + lastY + 1
+        y += newlines
+        start = end
+
+    if header is not None:
+        width = max(width, int(header.group(1)))
+        height = max(height, int(header.group(2)))
+    runs = [np.concatenate(arrays) for arrays in zip(*runs)] if runs else [np.zeros(0, dtype=np.int64)] * 3
+    return tuple(runs), (width, height)
+
+
+def _parseRLEChunk(data):
+    """
+    Runs of living cells (xs, ys, lengths) of RLE data that starts at the beginning of a line, the width of the
+    data, the y of the last tag (-1 without tags) and the number of lines.
+    """
+    chars = np.frombuffer(data, dtype="B")
+
+    isTag = (chars == ord("b")) | (chars == ord("o")) | (chars == ord("$"))
+    isDigit = (chars >= ord("0")) & (chars <= ord("9"))
+    if not np.all(isTag | isDigit):
+        invalid = chr(chars[~(isTag | isDigit)][0])
+        raise ValueError(f"Invalid char in RLE: {invalid}")
+
+    # Run count of every tag: the digits in front of it, 1 if there are none
+    tagPositions = np.flatnonzero(isTag)
+    digitPositions = np.flatnonzero(isDigit)
+    tagOfDigit = np.searchsorted(tagPositions, digitPositions)
+    counted = tagOfDigit < len(tagPositions)  # Digits behind the last tag are ignored
+    digitPositions, tagOfDigit = digitPositions[counted], tagOfDigit[counted]
+    exponents = tagPositions[tagOfDigit] - digitPositions - 1
+    values = (chars[digitPositions] - ord("0")).astype(np.int64) * 10 ** exponents
+    counts = np.ones(len(tagPositions), dtype=np.int64)
+    counts[tagOfDigit] = 0
+    np.add.at(counts, tagOfDigit, values)
+    tags = chars[tagPositions]
+
+    # y of every tag and x in front of every tag. x restarts after every $
+    isNewline = tags == ord("$")
+    ys = np.cumsum(np.where(isNewline, counts, 0)) - np.where(isNewline, counts, 0)
+    cellCounts = np.where(isNewline, 0, counts)
+    xEnds = np.cumsum(cellCounts)
+    lineStarts = np.maximum.accumulate(np.where(isNewline, xEnds, 0))
+    xEnds -= lineStarts
+    xStarts = xEnds - cellCounts
+
+    alive = tags == ord("o")
+    lastY = int(ys[-1]) if len(tags) else -1
+    newlines = int(counts[isNewline].sum())
+    return (xStarts[alive], ys[alive], counts[alive]), int(xEnds.max(initial=0)), lastY, newlines
+
+
+def loadRLECoordinates(filename):
+    """Coordinates of all living cells (xs, ys) of an RLE file and the board size (width, height)."""
+    (runX, runY, runLength), size = _loadRLERuns(filename)
+    cellOffsets = np.arange(runLength.sum()) - np.repeat(np.cumsum(runLength) - runLength, runLength)
+    return (np.repeat(runX, runLength) + cellOffsets, np.repeat(runY, runLength)), size
+
+
+def loadRLE(filename):
+    # RLE rows are the y-rows of the board. The runs are marked +1 at their start and -1 behind their end in a
+    # row-major buffer, the cumulative sum is then 1 exactly for the living cells. Needs 2 bytes per cell.
+    (runX, runY, runLength), (width, height) = _loadRLERuns(filename)
+    cells = np.zeros(width * height + 1, dtype=np.int8)
+    starts = runY * width + runX
+    cells[starts] = 1
+    cells[starts + runLength] -= 1  # Can be the start of the next run
+    np.cumsum(cells, out=cells)
+    return np.ascontiguousarray(cells[:-1].view(BOARD_DTYPE).reshape(height, width).T)
 
 
 # ===== Image To Grid =====
@@ -172,9 +358,7 @@ def fromImageToSpecificSize(path, size=None, threshold=128):
 
     if size is not None:
         img = cv2.resize(img, size)
-    w, h = img.shape
-    grid = [[1 - (img[x][y] >= threshold) for x in range(w)] for y in range(h)]
-    return grid
+    return np.ascontiguousarray((img < threshold).T)
 
 
 def fromImage(path, pixelPerCell=1, threshold=128):
@@ -183,23 +367,73 @@ def fromImage(path, pixelPerCell=1, threshold=128):
         raise ValueError("Cannot read image")
 
     img = cv2.resize(img, dsize=None, fx=1 / pixelPerCell, fy=1 / pixelPerCell)
-    w, h = img.shape
-    grid = [[1 - (img[x][y] >= threshold) for x in range(w)] for y in range(h)]
-    return grid
+    return np.ascontiguousarray((img < threshold).T)
 
 
 # ===== Static Functions =====
 def emptyBoard(width, height):
-    return np.zeros((width, height))
+    return np.zeros((width, height), dtype=BOARD_DTYPE)
 
 
 def createRandomBoard(width, height, rndThreshold=0.5):
+    # In chunks of rows, the random numbers would take 8 bytes per cell. Same result as a single call.
     board = emptyBoard(width, height)
-    rnd = np.random.random((width, height))
-    board[np.where(rnd < rndThreshold)] = 1
+    for x in range(0, width, RANDOM_ROWS_PER_CHUNK):
+        x1 = min(x + RANDOM_ROWS_PER_CHUNK, width)
+        np.less(np.random.random((x1 - x, height)), rndThreshold, out=board[x:x1])
     return board
 
 
+def asBoard(board):
+    """board with BOARD_DTYPE, without a copy if it already has it. E.g. for lists or int/float arrays."""
+    board = np.asarray(board)
+    return board if board.dtype == BOARD_DTYPE else board != 0
+
+
+def hashBoard(board):
+    """64-bit hash of the living cells and the size of a board, independent of its dtype."""
+    board = asBoard(board)
+    digest = hashlib.blake2b(np.packbits(board).tobytes(), digest_size=8)
+    digest.update(np.array(board.shape, dtype="<i8").tobytes())
+    return int.from_bytes(digest.digest(), "little")
+
+
+def regionOverlap(shape, xMin, yMin, xMax, yMax, originX=0, originY=0):
+    """
+    (x0, y0, x1, y1) in world coordinates of the part of the region that lies on a board of the given shape whose
+    first cell is at (originX, originY). Empty if x0 >= x1 or y0 >= y1.
+    """
+    return max(xMin, originX), max(yMin, originY), min(xMax, originX + shape[0]), min(yMax, originY + shape[1])
+
+
+def boardRegion(board, xMin, yMin, xMax, yMax, originX=0, originY=0):
+    """Cells with xMin <= x < xMax and yMin <= y < yMax of a board whose first cell is at (originX, originY)."""
+    region = np.zeros((max(0, xMax - xMin), max(0, yMax - yMin)), dtype=board.dtype)
+    x0, y0, x1, y1 = regionOverlap(board.shape, xMin, yMin, xMax, yMax, originX, originY)
+    if x0 < x1 and y0 < y1:
+        region[x0 - xMin:x1 - xMin, y0 - yMin:y1 - yMin] = board[x0 - originX:x1 - originX, y0 - originY:y1 - originY]
+    return region
+
+
+def neighbourSum(bordered, out=None):
+    """
+    Number of living neighbours of the inner cells of a uint8 board with a border of one cell, in place in out.
+    Works on stacks of boards (..., width + 2, height + 2) as well.
+    """
+    G = bordered
+    out = np.add(G[..., :-2, :-2], G[..., :-2, 1:-1], out=out)
+    for neighbour in (G[..., :-2, 2:], G[..., 1:-1, :-2], G[..., 1:-1, 2:], G[..., 2:, :-2], G[..., 2:, 1:-1],
+                      G[..., 2:, 2:]):
+        np.add(out, neighbour, out=out)
+    return out
+
+
+def regionNeighbours(board, xMin, yMin, xMax, yMax):
+    """Number of living neighbours of the cells of a region, read from board.getRegion with a margin of one cell."""
+    cells = board.getRegion(xMin - 1, yMin - 1, xMax + 1, yMax + 1)
+    return neighbourSum(np.asarray(cells, dtype=np.uint8))
+
+
 def checkEquals(board1, board2):
     return np.array_equal(board1, board2)
 
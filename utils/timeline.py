@@ -0,0 +1,209 @@
+import hashlib
+import os
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from gol import GoL
+from utils import boardIO
+
+# Fixed header followed by one record per generation. A record is a record header and the zlib compressed, bit-packed
+# window of the generation (keyframe) or its XOR with the previous generation (delta). Every TIMELINE_KEYFRAMES-th
+# generation is a keyframe, so any generation is restored from at most TIMELINE_KEYFRAMES - 1 deltas.
+TIMELINE_MAGIC = b"GOLTIMEL"
+TIMELINE_VERSION = 1
+TIMELINE_HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("keyframeInterval", "<u4"), ("boardHash", "<u8"),
+                            ("width", "<u8"), ("height", "<u8"),
+                            ("xMin", "<i8"), ("yMin", "<i8"), ("xMax", "<i8"), ("yMax", "<i8")])
+TIMELINE_RECORD = np.dtype([("keyframe", "u1"), ("size", "<u8")])
+TIMELINE_KEYFRAMES = 64
+TIMELINE_FOLDER = "../data/timelines"
+
+
+class GenerationTimeline:
+    """
+    Generations of one simulation stored on disk, e.g. to render the same run several times with different styles
+    without simulating it again. Every generation stores the cells of window (xMin, yMin, xMax, yMax) in world
+    coordinates, which can be larger than the board for engines with an unbounded universe.
+
+    board(k) seeks to generation k, boards(start) streams the generations, toGoL(k) returns a GoL that plays the
+    timeline back instead of simulating, so it can be passed to the renderers unchanged.
+    """
+
+    def __init__(self, filename, mode="r"):
+        self.filename = filename
+        header = np.fromfile(filename, dtype=TIMELINE_HEADER, count=1)
+        if len(header) == 0 or header["magic"][0] != TIMELINE_MAGIC:
+            raise ValueError(f"{filename} is not a generation timeline")
+        if header["version"][0] != TIMELINE_VERSION:
+            raise ValueError(f"Unsupported timeline version: {header['version'][0]}")
+        self.keyframeInterval = int(header["keyframeInterval"][0])
+        self.boardHash = int(header["boardHash"][0])
+        self.width, self.height = int(header["width"][0]), int(header["height"][0])
+        self.window = tuple(int(header[key][0]) for key in ("xMin", "yMin", "xMax", "yMax"))
+        self.windowShape = (self.window[2] - self.window[0], self.window[3] - self.window[1])
+
+        self._file = open(filename, "r+b" if mode == "r+" else "rb")
+        self._offsets = self._readOffsets()
+        self._last = None  # (generation, window) of the last decoded generation
+        self._written = None  # Window of the last appended generation
+
+    @staticmethod
+    def create(filename, initBoard, window=None, keyframeInterval=TIMELINE_KEYFRAMES):
+        """Creates an empty timeline for the simulation of initBoard and opens it for appending."""
+        width, height = np.shape(initBoard)
+        xMin, yMin, xMax, yMax = window if window is not None else (0, 0, width, height)
+        os.makedirs(Path(filename).parent, exist_ok=True)
+        header = np.array([(TIMELINE_MAGIC, TIMELINE_VERSION, keyframeInterval, boardIO.hashBoard(initBoard),
+                            width, height, xMin, yMin, xMax, yMax)], dtype=TIMELINE_HEADER)
+        with open(filename, "wb") as d:
+            d.write(header.tobytes())
+        return GenerationTimeline(filename, mode="r+")
+
+    @staticmethod
+    def record(gol: GoL, generations, filename, window=None, keyframeInterval=TIMELINE_KEYFRAMES):
+        """Simulates gol for the given number of generations and stores the current and all following generations."""
+        timeline = GenerationTimeline.create(filename, gol.board, window, keyframeInterval)
+        for i in range(generations + 1):
+            if i:
+                gol.step()
+            timeline.append(gol.getRegion(*timeline.window))
+        timeline.flush()
+        return timeline
+
+    def _readOffsets(self):
+        """Positions of all complete records. An incomplete record at the end (interrupted recording) is dropped."""
+        offsets = []
+        fileSize = os.fstat(self._file.fileno()).st_size
+        offset = TIMELINE_HEADER.itemsize
+        while offset + TIMELINE_RECORD.itemsize <= fileSize:
+            self._file.seek(offset)
+            record = np.frombuffer(self._file.read(TIMELINE_RECORD.itemsize), dtype=TIMELINE_RECORD)[0]
+            end = offset + TIMELINE_RECORD.itemsize + int(record["size"])
+            if end > fileSize:
+                break
+            offsets.append(offset)
+            offset = end
+        if self._file.writable():
+            self._file.truncate(offset)
+        return offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def append(self, window):
+        """Appends the window of the next generation."""
+        window = np.asarray(window) != 0
+        if window.shape != self.windowShape:
+            raise ValueError(f"Window of shape {window.shape} does not match the timeline window {self.windowShape}")
+        if self._written is None and len(self):
+            self._written = self.board(len(self) - 1, window=True)
+
+        keyframe = len(self) % self.keyframeInterval == 0
+        cells = window if keyframe else window ^ self._written
+        data = zlib.compress(np.packbits(cells).tobytes(), 1)
+
+        self._file.seek(0, os.SEEK_END)
+        self._offsets.append(self._file.tell())
+        self._file.write(np.array([(keyframe, len(data))], dtype=TIMELINE_RECORD).tobytes())
+        self._file.write(data)
+        self._written = window
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __del__(self):
+        if hasattr(self, "_file"):
+            self.close()
+
+    def _readRecord(self, generation):
+        self._file.seek(self._offsets[generation])
+        record = np.frombuffer(self._file.read(TIMELINE_RECORD.itemsize), dtype=TIMELINE_RECORD)[0]
+        cells = np.unpackbits(np.frombuffer(zlib.decompress(self._file.read(int(record["size"]))), dtype="B"),
+                              count=self.windowShape[0] * self.windowShape[1])
+        return bool(record["keyframe"]), cells.reshape(self.windowShape).view(bool)
+
+    def board(self, generation, window=False):
+        """
+        The board of the given generation, or the whole window with window=True. Decoding starts at the last
+        keyframe, or at the previously decoded generation when reading forwards.
+        """
+        if not 0 <= generation < len(self):
+            raise IndexError(f"Generation {generation} is not in the timeline ({len(self)} generations)")
+        start = generation - generation % self.keyframeInterval
+        if self._last is not None and start <= self._last[0] <= generation:
+            current, cells = self._last
+        else:
+            current, cells = start, self._readRecord(start)[1]
+        for i in range(current + 1, generation + 1):
+            keyframe, record = self._readRecord(i)
+            cells = record if keyframe else cells ^ record
+        self._last = generation, cells
+
+        if window:
+            return cells
+        return self.getRegion(cells, 0, 0, self.width, self.height)
+
+    def boards(self, start=0, stop=None):
+        """Streams the boards of generations start to stop (exclusive, defaults to the end)."""
+        for generation in range(start, len(self) if stop is None else stop):
+            yield self.board(generation)
+
+    def getRegion(self, cells, xMin, yMin, xMax, yMax):
+        """Cells with xMin <= x < xMax and yMin <= y < yMax in world coordinates of a decoded window."""
+        return boardIO.boardRegion(cells, xMin, yMin, xMax, yMax, *self.window[:2])
+
+    def toGoL(self, generation=0):
+        """
+        GoL at the given generation whose steps are read from the timeline. Changed cells (setXY or a new board) are
+        kept until the next step, which continues with the recorded generation after the current one.
+        """
+        gol = GoL(self.board(generation))
+        gol.generation = generation
+        gol.engineFactory = lambda board: TimelineEngine(self, gol.generation)
+        return gol
+
+
+class TimelineEngine:
+    """Plays back a GenerationTimeline, see GenerationTimeline.toGoL."""
+
+    def __init__(self, timeline: GenerationTimeline, generation=0):
+        self.timeline = timeline
+        self.generation = generation
+        self._cells = timeline.board(generation, window=True)
+
+    def step(self, n=1):
+        self._cells = self.timeline.board(self.generation + n, window=True)  # IndexError after the last generation
+        self.generation += n
+
+    def getRegion(self, xMin, yMin, xMax, yMax):
+        return self.timeline.getRegion(self._cells, xMin, yMin, xMax, yMax)
+
+    def toBoard(self):
+        return self.getRegion(0, 0, self.timeline.width, self.timeline.height)
+
+
+def timelineFilename(gol: GoL, window=None, folder=TIMELINE_FOLDER):
+    """File of the timeline of gol, keyed by the hash of its board, the window, the boundary and the engine."""
+    engine = getattr(gol.engineFactory, "func", gol.engineFactory)  # functools.partial
+    engine = getattr(engine, "__name__", type(engine).__name__)
+    key = hashlib.blake2b(repr((boardIO.hashBoard(gol.board), window, gol.boundary, engine)).encode(), digest_size=8)
+    return str(Path(folder) / f"{gol.name}-{key.hexdigest()}.golT")
+
+
+def loadTimeline(gol: GoL, generations, window=None, folder=TIMELINE_FOLDER):
+    """
+    Timeline with the current and the following generations of gol. Reuses the stored timeline of the same board and
+    settings if it is long enough, otherwise gol is simulated and the timeline is recorded.
+    """
+    filename = timelineFilename(gol, window, folder)
+    if os.path.exists(filename):
+        timeline = GenerationTimeline(filename)
+        if len(timeline) > generations and timeline.boardHash == boardIO.hashBoard(gol.board):
+            return timeline
+        timeline.close()
+    return GenerationTimeline.record(gol, generations, filename, window)
@@ -0,0 +1,99 @@
+import os
+import queue
+import subprocess
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Default encoder settings for PipeVideoWriter
+FFMPEG = "ffmpeg"
+CODEC_ARGS = ["-c:v", "libx264", "-preset", "medium", "-crf", "18", "-pix_fmt", "yuv420p"]
+# Lossless and intra-only (every frame is a keyframe), for long board videos that are edited/cut afterwards
+CODEC_ARGS_LOSSLESS = ["-c:v", "ffv1", "-level", "3", "-g", "1"]
+
+
+# All writers share the interface of cv2.VideoWriter (write(img), release()) and are created by
+# GoLVideoRenderer(videoWriter=...) with (filename, fps, frameSize)
+def cv2VideoWriter(filename, fps, frameSize, fourcc="XVID"):
+    os.makedirs(Path(filename).parent, exist_ok=True)
+    return cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*fourcc), fps, frameSize, isColor=1)
+
+
+class PipeVideoWriter:
+    """
+    Streams raw BGR frames into the stdin of an external encoder (ffmpeg by default). Frames are passed through a
+    bounded buffer to a writer thread, so rendering only blocks when the encoder falls behind by bufferSize frames.
+    """
+
+    def __init__(self, filename, fps, frameSize, lossless=False, bufferSize=32, codecArgs=None, command=None):
+        self.filename = filename
+        self.frameSize = frameSize
+        width, height = frameSize
+
+        if command is None:
+            if codecArgs is None:
+                codecArgs = CODEC_ARGS_LOSSLESS if lossless else CODEC_ARGS
+            command = [FFMPEG, "-y", "-loglevel", "error",
+                       "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+                       *codecArgs, filename]
+        os.makedirs(Path(filename).parent, exist_ok=True)
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+        self.frames = queue.Queue(maxsize=bufferSize)
+        self.error = None
+        self.thread = threading.Thread(target=self._writeFrames, daemon=True)
+        self.thread.start()
+
+    def write(self, img):
+        if self.error is not None:
+            raise self.error
+        if self.process is None:
+            return
+        img = np.asarray(img)
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        if img.shape[1::-1] != tuple(self.frameSize):
+            raise ValueError(f"Frame size {img.shape[1::-1]} does not match video size {tuple(self.frameSize)}")
+        self.frames.put(np.ascontiguousarray(img, dtype="B"))
+
+    def _writeFrames(self):
+        try:
+            while True:
+                img = self.frames.get()
+                if img is None:
+                    break
+                self.process.stdin.write(img.data)
+        except (BrokenPipeError, OSError) as e:
+            self.error = e
+            while self.frames.get() is not None:  # Keep write() from blocking
+                pass
+
+    def release(self):
+        if self.process is None:
+            return
+        self.frames.put(None)
+        self.thread.join()
+        self.process.stdin.close()
+        returncode = self.process.wait()
+        self.process = None
+        if self.error is None and returncode != 0:
+            self.error = RuntimeError(f"Encoder for {self.filename} exited with code {returncode}")
+        if self.error is not None:
+            raise self.error
+
+
+class NullVideoWriter:
+    """Discards all frames. Used to measure rendering without encoding."""
+
+    def __init__(self, filename=None, fps=None, frameSize=None):
+        self.nFrames = 0
+        self.nBytes = 0
+
+    def write(self, img):
+        self.nFrames += 1
+        self.nBytes += img.nbytes
+
+    def release(self):
+        pass
@@ -1,7 +1,7 @@
 import random
 
 import utils.colormaps as cm
-from VideoRenderer import AbortDifHandler, GoLVideoRenderer
+from VideoRenderer import CycleDetector, GoLVideoRenderer
 from gol import GoL
 from utils import boardIO
 
@@ -18,8 +18,8 @@ if __name__ == '__main__':
         print(f"On Cells: ~{rndThresh * 100:.2f}%")
         board = boardIO.createRandomBoard(192 * k, 108 * k, rndThreshold=rndThresh)
         gol = GoL(board)
-        abort = AbortDifHandler(board, extendGenerations=150)
-        vid.appendGoL(gol, 1000, abortCondition=AbortDifHandler(board), onColorChange=0, offColorChange=0)
+        abort = CycleDetector(board, extendGenerations=150)
+        vid.appendGoL(gol, 1000, abortCondition=abort, onColorChange=0, offColorChange=0)
         # try:
         #     vid.colormap.invert()
         # except AttributeError:
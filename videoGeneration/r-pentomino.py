@@ -1,29 +1,37 @@
 import utils.colormaps as  cm
 from VideoRenderer import GoLVideoRenderer
+from engines.sparse import SparseEngine
 from gol import GoL
 from golImage import GoLImageRenderer
 from imageRenderer import renderImage
 from utils import boardIO
+from utils.timeline import loadTimeline
 
 if __name__ == '__main__':
+    # No border needed: the sparse engine grows the universe, viewports are in world coordinates
     board = boardIO.loadBoard("../data/boards/r-pentomino")
-    board = boardIO.addBorder(board, 400)
+    width, height = board.shape
     colormap = cm.COLORMAP_WHITE_GREEN
 
-    tl = (350, 350)
-    br = (-351, -351)
+    tl = (-50, -50)
+    br = (width + 49, height + 49)
+    # Simulated once and stored in ../data/timelines, both passes below (and later runs) play it back
+    gol = GoL(board, engine=SparseEngine)
+    gol.name = "r-pentomino"
+    timeline = loadTimeline(gol, 1200, window=(*tl, br[0] + 1, br[1] + 1))
+
     # === Static Images ===
     golImages = GoLImageRenderer("../data/images/r-pentomino", 1080, 1080, colormap=colormap)
-    gol = GoL(board)
+    gol = timeline.toGoL()
     gol.name = "r-pentomino"
     golImages.appendGoL(gol, maxGenerations=1199, tl=tl, br=br)
 
     # === Zoom out Video ===
-    gol = GoL(board)
+    gol = timeline.toGoL()
     golVideo = GoLVideoRenderer("../data/videos/r-pentomino-zoom.avi", 1080, 1080, fps=24, fpg=4, colormap=colormap,
                                 renderer=renderImage)
-    tl = ((398, 398), tl)
-    br = ((-399, -399), br)
+    tl = ((-2, -2), tl)
+    br = ((width + 1, height + 1), br)
     # golVideo.appendGoL(gol, 200, tl, br,preview=False)
     golVideo.fpg = 1
     golVideo.appendGoL(gol, 792, tl, br, preview=False)
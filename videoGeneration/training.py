@@ -1,7 +1,7 @@
 import itertools
 import random
 
-from gol import GoL
+from gol import HISTORY_BUDGET, GoL
 from golImage import GoLImageRenderer
 from utils import boardIO
 
@@ -13,7 +13,7 @@ if __name__ == '__main__':
         # Base settings
         rndThresh = random.random() * 0.4 + 0.2  # range 0.2 - 0.6
         board = boardIO.createRandomBoard(10, 10, rndThresh)
-        gol = GoL(board)
+        gol = GoL(board, historyBudget=HISTORY_BUDGET)
 
         # Marked tiles
         colors = cm.COLORS_MARK3
@@ -29,7 +29,7 @@ if __name__ == '__main__':
         gol.name = f"Training{i:02d}_"
         golTraining.appendGoL(gol)
 
-        gol.reset()
+        gol.seek(0)  # The generations of the first pass are replayed from the history
         gol.name = f"Training{i:02d}N_"
         golTraining.renderSettings.showNeighbours = True
         golTraining.appendGoL(gol)